@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""Offline benchmarks for ghl-api.py against the bundled mock server.
+
+Usage: python3 benchmark.py [pagination] [retries] [bulk] [--contacts 5000]
+                            [--latency-ms 20] [--workers 8] [--rate-limit] [--json]
+
+Each run starts mock-server.py on a free local port, points ghl-api.py at it
+with HIGHLEVEL_BASE_URL and a throwaway HIGHLEVEL_STATE_DIR, and reports:
+  pagination — records/s and pages/s for a full contact listing
+  retries    — the same listing with injected 429s and 5xx errors, and the time lost to them
+  bulk       — bulk_write upsert_contact records/s through the worker pool
+
+Client-side rate limiting is off unless --rate-limit is given, so the numbers
+show the client's own overhead rather than GHL's 100 requests / 10s budget.
+"""
+
+import argparse, importlib.util, json, os, shutil, sys, tempfile, time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def _load(name, filename):
+    spec = importlib.util.spec_from_file_location(name, os.path.join(HERE, filename))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _client(base_url, state_dir, rate_limit):
+    """A fresh ghl-api module bound to the mock server (module-level config is read at import)."""
+    os.environ.update(HIGHLEVEL_BASE_URL=base_url, HIGHLEVEL_TOKEN="mock", HIGHLEVEL_LOCATION_ID="mockloc",
+                      HIGHLEVEL_STATE_DIR=state_dir, HIGHLEVEL_DAEMON="off", HIGHLEVEL_CACHE="off",
+                      HIGHLEVEL_RATE_LIMIT="on" if rate_limit else "off")
+    for name in ("HIGHLEVEL_TRACE", "HIGHLEVEL_METRICS_FILE", "HIGHLEVEL_LOCATIONS", "HIGHLEVEL_LOCATIONS_FILE"):
+        os.environ.pop(name, None)
+    return _load("ghl_api_bench", "ghl-api.py")
+
+
+def _endpoint_totals(ghl):
+    """Sum the client's per-endpoint metrics into one dict."""
+    totals = {}
+    for counters in ghl._metrics.snapshot().values():
+        for key in ("attempts", "retries", "status_429", "status_5xx", "bytes_in", "backoff_s", "throttle_s"):
+            totals[key] = round(totals.get(key, 0) + counters[key], 3)
+    return totals
+
+
+def bench_listing(mock, opts, state_dir, rate_429=0.0, rate_5xx=0.0):
+    """Stream every contact page by page, as `export` does."""
+    server = mock.start_server(contacts=opts.contacts, latency_ms=opts.latency_ms, rate_429=rate_429,
+                               retry_after=opts.retry_after, rate_5xx=rate_5xx, seed=opts.seed)
+    try:
+        ghl = _client(server.base_url, state_dir, opts.rate_limit)
+        paged = ghl._Paged("/contacts/", max_pages=None)
+        started = time.perf_counter()
+        records = sum(len(page) for page in paged.iter_pages())
+        elapsed = time.perf_counter() - started
+        ghl._pool.close()
+        return {
+            "records": records, "pages": paged.pages, "complete": paged.complete,
+            "elapsed_s": round(elapsed, 3),
+            "records_per_s": round(records / elapsed, 1) if elapsed else None,
+            "pages_per_s": round(paged.pages / elapsed, 1) if elapsed else None,
+            **_endpoint_totals(ghl),
+            "connections": ghl.connection_stats(),
+        }
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def bench_pagination(mock, opts, state_dir):
+    return bench_listing(mock, opts, state_dir)
+
+
+def bench_retries(mock, opts, state_dir):
+    baseline = bench_listing(mock, opts, state_dir)
+    faulty = bench_listing(mock, opts, state_dir, rate_429=opts.rate_429, rate_5xx=opts.rate_5xx)
+    return {
+        "rate_429": opts.rate_429, "rate_5xx": opts.rate_5xx,
+        "baseline_s": baseline["elapsed_s"], "with_faults_s": faulty["elapsed_s"],
+        "overhead_s": round(faulty["elapsed_s"] - baseline["elapsed_s"], 3),
+        "complete": faulty["complete"], "retries": faulty["retries"],
+        "status_429": faulty["status_429"], "status_5xx": faulty["status_5xx"], "backoff_s": faulty["backoff_s"],
+    }
+
+
+def bench_bulk(mock, opts, state_dir):
+    """Upsert --records synthetic leads through bulk_write."""
+    server = mock.start_server(contacts=0, latency_ms=opts.latency_ms, seed=opts.seed)
+    try:
+        ghl = _client(server.base_url, state_dir, opts.rate_limit)
+        path = os.path.join(state_dir, "leads.ndjson")
+        with open(path, "w") as f:
+            for i in range(opts.records):
+                f.write(json.dumps({"firstName": f"Lead{i}", "email": f"lead{i}@example.com", "tags": "buyer"}) + "\n")
+        started = time.perf_counter()
+        result = ghl.bulk_write("upsert_contact", path, "--workers", str(opts.workers))
+        elapsed = time.perf_counter() - started
+        ghl._pool.close()
+        succeeded = result.get("succeeded", 0) if isinstance(result, dict) else 0
+        return {
+            "records": opts.records, "workers": opts.workers, "succeeded": succeeded,
+            "elapsed_s": round(elapsed, 3), "records_per_s": round(succeeded / elapsed, 1) if elapsed else None,
+            **_endpoint_totals(ghl),
+        }
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+BENCHMARKS = {"pagination": bench_pagination, "retries": bench_retries, "bulk": bench_bulk}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ghl-api.py against the local mock server.")
+    parser.add_argument("benchmarks", nargs="*", help=f"any of {', '.join(BENCHMARKS)} (default: all)")
+    parser.add_argument("--contacts", type=int, default=5000, help="contacts served for the listing benchmarks")
+    parser.add_argument("--records", type=int, default=1000, help="records written by the bulk benchmark")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="simulated server latency per request")
+    parser.add_argument("--workers", type=int, default=8, help="bulk_write workers")
+    parser.add_argument("--rate-429", type=float, default=0.05, help="429 fraction for the retries benchmark")
+    parser.add_argument("--rate-5xx", type=float, default=0.02, help="5xx fraction for the retries benchmark")
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--rate-limit", action="store_true", help="keep client-side rate limiting on")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="print one JSON document instead of a table")
+    opts = parser.parse_args()
+    unknown = set(opts.benchmarks) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmark: {', '.join(sorted(unknown))}")
+
+    mock = _load("ghl_mock_server", "mock-server.py")
+    results = {}
+    for name in opts.benchmarks or list(BENCHMARKS):
+        state_dir = tempfile.mkdtemp(prefix=f"ghl-bench-{name}-")
+        try:
+            results[name] = BENCHMARKS[name](mock, opts, state_dir)
+        finally:
+            shutil.rmtree(state_dir, ignore_errors=True)
+        if not opts.json:
+            print(f"{name:<11}" + "  ".join(f"{k}={v}" for k, v in results[name].items() if not isinstance(v, dict)))
+    if opts.json:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
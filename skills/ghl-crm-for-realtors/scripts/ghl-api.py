@@ -1,20 +1,37 @@
 #!/usr/bin/env python3
 """GoHighLevel API v2 Helper — supports all 39 endpoint groups.
-Usage: python3 ghl-api.py <command> [args...]
+Usage: python3 ghl-api.py [--stats] [--format pretty|compact|ndjson|csv] [--fields F,F] [--ndjson] [--local] [--max-age SECONDS] [--locations all|ID,ID] [--trace FILE] <command> [args...]
+       python3 ghl-api.py serve [--stdio]   (long-running JSON-RPC daemon)
 
 Environment:
   HIGHLEVEL_TOKEN       — Private Integration Bearer token (required)
   HIGHLEVEL_LOCATION_ID — Sub-account Location ID (required)
+  HIGHLEVEL_LOCATIONS   — Sub-accounts for --locations fan-out (optional, see _load_locations)
+  HIGHLEVEL_BASE_URL    — API base URL override (optional, e.g. a local mock-server.py)
 
 Base URL: https://services.leadconnectorhq.com
 All requests include: Authorization: Bearer <token>, Version: 2021-07-28
 """
 
-import json, os, re, sys, time, urllib.request, urllib.error, urllib.parse
+import asyncio, atexit, base64, contextlib, contextvars, copy, csv, functools, hashlib, http.client, inspect, itertools, json, os, queue, random, re, signal, socket, socketserver, sqlite3, ssl, sys, threading, time, urllib.request, urllib.parse, zlib
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 
-BASE = "https://services.leadconnectorhq.com"
+try:
+    import fcntl  # POSIX advisory locks for state shared between CLI processes
+except ImportError:  # pragma: no cover - Windows falls back to per-process state
+    fcntl = None
+
+try:
+    import orjson  # optional accelerated JSON backend; the stdlib json module is the fallback
+except ImportError:
+    orjson = None
+if os.environ.get("HIGHLEVEL_JSON_BACKEND", "").strip().lower() == "stdlib":
+    orjson = None
+
+# HIGHLEVEL_BASE_URL points the client elsewhere, e.g. at mock-server.py for offline tests
+BASE = os.environ.get("HIGHLEVEL_BASE_URL", "").strip().rstrip("/") or "https://services.leadconnectorhq.com"
 VERSION = "2021-07-28"
-MAX_RETRIES = 3
+REQUEST_TIMEOUT = 30
 
 # ──────────────────────────────────────────────
 # Credentials & Validation
@@ -44,14 +61,1009 @@ def _load_creds():
 
 TOKEN, LOC_ID = _load_creds()
 
+# Per-context credential override (token, location_id); set while fanning out across locations
+_credentials = contextvars.ContextVar("ghl_credentials", default=None)
+
+
+def _token():
+    """Bearer token for the current context (the fan-out location's, else HIGHLEVEL_TOKEN)."""
+    creds = _credentials.get()
+    return creds[0] if creds else TOKEN
+
+
+def _loc():
+    """Location ID for the current context (the fan-out location's, else HIGHLEVEL_LOCATION_ID)."""
+    creds = _credentials.get()
+    return creds[1] if creds else LOC_ID
+
+
+# ──────────────────────────────────────────────
+# Connection Pool (keep-alive transport)
+# ──────────────────────────────────────────────
+
+def _env_int(name, default):
+    """Read an integer environment variable, falling back to default when unset or malformed."""
+    try:
+        return int(os.environ.get(name, "").strip() or default)
+    except ValueError:
+        return default
+
+
+def _env_float(name, default):
+    """Read a float environment variable, falling back to default when unset or malformed."""
+    try:
+        return float(os.environ.get(name, "").strip() or default)
+    except ValueError:
+        return default
+
+
+def _env_flag(name):
+    """Read an on/off environment variable: on unless set to 0, off, false or no."""
+    return os.environ.get(name, "on").strip().lower() not in ("0", "off", "false", "no")
+
+
+POOL_MAXSIZE = _env_int("HIGHLEVEL_POOL_SIZE", 10)
+POOL_IDLE_TIMEOUT = 50  # seconds; drop idle sockets before the server's keep-alive timer does
+
+# Ask for gzip/deflate bodies and inflate them while reading (HIGHLEVEL_COMPRESSION=off to disable)
+COMPRESSION_ENABLED = _env_flag("HIGHLEVEL_COMPRESSION")
+READ_CHUNK = 64 * 1024
+
+# Errors that mean a reused keep-alive socket was already closed by the server
+_STALE_ERRORS = (http.client.RemoteDisconnected, http.client.BadStatusLine, ConnectionResetError,
+                 ConnectionAbortedError, BrokenPipeError)
+
+# Methods that may be sent again after the server could already have received them
+_RETRY_SAFE_METHODS = ("GET", "HEAD")
+
+
+class _ConnectionPool:
+    """Thread-safe pool of keep-alive http.client connections, keyed by (scheme, host, port).
+
+    Idle connections are handed out LIFO so the warmest socket is reused first.
+    A reused socket that turns out to be closed is replaced once, transparently.
+    """
+
+    def __init__(self, maxsize=POOL_MAXSIZE, timeout=REQUEST_TIMEOUT):
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self._idle = {}
+        self._lock = threading.Lock()
+        self._ssl = None
+        self._stats = {"requests": 0, "created": 0, "reused": 0, "stale": 0, "discarded": 0,
+                       "compressed_responses": 0, "bytes_wire": 0, "bytes_decoded": 0}
+
+    def _count(self, key, n=1):
+        with self._lock:
+            self._stats[key] += n
+
+    def _connect(self, scheme, host, port):
+        """Open a new connection, tunnelling through an HTTP(S) proxy from the environment if set."""
+        proxy = None if urllib.request.proxy_bypass(host) else urllib.request.getproxies().get(scheme)
+        target_host, target_port = host, port
+        if proxy:
+            p = urllib.parse.urlsplit(proxy if "://" in proxy else f"http://{proxy}")
+            target_host, target_port = p.hostname, p.port or 8080
+        if scheme == "https":
+            if self._ssl is None:
+                self._ssl = ssl.create_default_context()
+            conn = http.client.HTTPSConnection(target_host, target_port, timeout=self.timeout, context=self._ssl)
+        else:
+            conn = http.client.HTTPConnection(target_host, target_port, timeout=self.timeout)
+        if proxy:
+            tunnel_headers = {}
+            if p.username:
+                cred = f"{urllib.parse.unquote(p.username)}:{urllib.parse.unquote(p.password or '')}"
+                tunnel_headers["Proxy-Authorization"] = "Basic " + base64.b64encode(cred.encode()).decode()
+            conn.set_tunnel(host, port, headers=tunnel_headers)
+        self._count("created")
+        return conn
+
+    def _acquire(self, key):
+        now = time.monotonic()
+        with self._lock:
+            idle = self._idle.get(key, [])
+            while idle:
+                conn, last_used = idle.pop()
+                if now - last_used < POOL_IDLE_TIMEOUT:
+                    self._stats["reused"] += 1
+                    return conn, True
+                conn.close()
+                self._stats["discarded"] += 1
+        return self._connect(*key), False
+
+    def _release(self, key, conn, resp):
+        if resp.will_close:
+            conn.close()
+            return
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.maxsize:
+                idle.append((conn, time.monotonic()))
+                return
+            self._stats["discarded"] += 1
+        conn.close()
+
+    @staticmethod
+    def _read(resp):
+        """Read a response body, inflating gzip/deflate chunk by chunk as it arrives.
+
+        Returns (body, wire_bytes, compressed)."""
+        encoding = (resp.getheader("Content-Encoding") or "").strip().lower()
+        if encoding not in ("gzip", "x-gzip", "deflate"):
+            data = resp.read()
+            return data, len(data), False
+        # wbits 32+15 accepts both gzip and zlib framing; some servers send raw deflate instead
+        inflater, chunks, wire = zlib.decompressobj(32 + zlib.MAX_WBITS), [], 0
+        while True:
+            chunk = resp.read(READ_CHUNK)
+            if not chunk:
+                break
+            if wire == 0 and encoding == "deflate" and chunk[:1] not in (b"\x78", b"\x1f"):
+                inflater = zlib.decompressobj(-zlib.MAX_WBITS)
+            wire += len(chunk)
+            try:
+                chunks.append(inflater.decompress(chunk))
+            except zlib.error as e:
+                raise http.client.HTTPException(f"Could not decode {encoding} response body: {e}")
+        chunks.append(inflater.flush())
+        return b"".join(chunks), wire, True
+
+    def request(self, method, url, body=None, headers=None, timeout=None, idempotent=None):
+        """Send one request and read the full response.
+
+        Returns (status, headers, body_bytes) with the body already decompressed.
+        `timeout` shortens the socket timeout for this request only; `idempotent`
+        (default: GET or HEAD) allows resending it on a stale socket after it went out. Transport
+        failures raise OSError or http.client.HTTPException so callers can apply
+        their own retry policy; the exception's `request_sent` attribute is False
+        only when the failure came before any of the request was sent.
+        """
+        timeout = self.timeout if timeout is None else max(0.1, min(self.timeout, timeout))
+        parts = urllib.parse.urlsplit(url)
+        scheme = parts.scheme or "https"
+        key = (scheme, parts.hostname, parts.port or (443 if scheme == "https" else 80))
+        target = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        self._count("requests")
+        if idempotent is None:
+            idempotent = method in _RETRY_SAFE_METHODS
+
+        while True:
+            conn, reused = self._acquire(key)
+            conn.timeout = timeout
+            if conn.sock:
+                conn.sock.settimeout(timeout)
+            stage = "connect"
+            try:
+                if conn.sock is None:
+                    conn.connect()
+                stage = "send"
+                if COMPRESSION_ENABLED:
+                    headers = {"Accept-Encoding": "gzip, deflate", **(headers or {})}
+                conn.request(method, target, body=body, headers=headers or {})
+                stage = "response"
+                resp = conn.getresponse()
+                stage = "body"
+                data, wire, compressed = self._read(resp)
+            except _STALE_ERRORS as e:
+                conn.close()
+                # A reused socket the server had already closed: it never read the request, unless
+                # it got as far as a response. Writes are only resent when no status line came back.
+                if reused and (stage == "send" or stage == "response" and (
+                        idempotent or isinstance(e, http.client.RemoteDisconnected))):
+                    self._count("stale")
+                    continue
+                e.request_sent = stage != "connect"
+                raise
+            except BaseException as e:
+                conn.close()
+                e.request_sent = stage != "connect"
+                raise
+            self._release(key, conn, resp)
+            with self._lock:
+                self._stats["bytes_wire"] += wire
+                self._stats["bytes_decoded"] += len(data)
+                self._stats["compressed_responses"] += compressed
+            return resp.status, resp.headers, data
+
+    def stats(self):
+        """Connection reuse counters for this process."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["idle"] = sum(len(v) for v in self._idle.values())
+        opened = stats["created"] + stats["reused"]
+        stats["compression_ratio"] = round(stats["bytes_decoded"] / stats["bytes_wire"], 2) if stats["bytes_wire"] else None
+        stats["reuse_ratio"] = round(stats["reused"] / opened, 3) if opened else 0.0
+        return stats
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for conns in idle.values():
+            for conn, _ in conns:
+                conn.close()
+
+
+_pool = _ConnectionPool()
+
+
+def connection_stats():
+    """Return keep-alive pool counters (connections created, reused, stale retries, bytes on the wire vs decoded)."""
+    return _pool.stats()
+
+
+# Sections reported by --stats; later subsystems register their own counters here
+_STATS_SOURCES = {"connections": connection_stats}
+
+
+def stats_report():
+    """Counters from every instrumented subsystem in this process."""
+    return {name: source() for name, source in _STATS_SOURCES.items()}
+
+
+# ──────────────────────────────────────────────
+# Local State (shared between CLI processes)
+# ──────────────────────────────────────────────
+
+STATE_DIR = os.path.expanduser(os.environ.get("HIGHLEVEL_STATE_DIR", "").strip() or "~/.cache/openclaw-ghl")
+
+
+def _state_path(name):
+    """Path of a file in the skill's private state directory (created 0700 on first use)."""
+    os.makedirs(STATE_DIR, mode=0o700, exist_ok=True)
+    return os.path.join(STATE_DIR, name)
+
+
+@contextlib.contextmanager
+def _locked_json(path):
+    """Read-modify-write a small JSON file under an exclusive lock.
+
+    Yields the decoded dict; whatever it holds when the block exits is written
+    back before the lock is released, unless it is unchanged. Corrupt or missing
+    files start empty. Opening the file can raise OSError; a failed write-back
+    (disk full, read-only) only loses that update.
+    """
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+    with os.fdopen(fd, "r+") as f:
+        if fcntl:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            raw = f.read()
+            try:
+                state = json.loads(raw or "{}")
+            except ValueError:
+                state = {}
+            yield state
+            text = json.dumps(state)
+            if text != raw:
+                try:
+                    f.seek(0)
+                    f.truncate()
+                    f.write(text)
+                    f.flush()
+                except OSError:
+                    pass
+        finally:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+@contextlib.contextmanager
+def _shared_state(name, memory):
+    """_locked_json on the state file `name`, or the in-memory dict `memory` when
+    the state directory can't be used. The choice is made before yielding, so an
+    error raised inside the block propagates instead of falling back mid-use."""
+    with contextlib.ExitStack() as stack:
+        try:
+            state = stack.enter_context(_locked_json(_state_path(name)))
+        except OSError:
+            state = memory
+        yield state
+
+
+# ──────────────────────────────────────────────
+# Rate Limiter (token bucket per location)
+# ──────────────────────────────────────────────
+
+# GHL allows 100 requests per 10s burst window and 200,000 per day per location.
+RATE_LIMIT_ENABLED = _env_flag("HIGHLEVEL_RATE_LIMIT")
+BURST_MAX = _env_int("HIGHLEVEL_BURST_MAX", 100)
+BURST_INTERVAL_MS = _env_int("HIGHLEVEL_BURST_INTERVAL_MS", 10000)
+DAILY_RESERVE = _env_int("HIGHLEVEL_DAILY_RESERVE", 100)
+# Tokens bulk work leaves in the bucket so an interactive call rarely has to wait at all
+INTERACTIVE_RESERVE = _env_int("HIGHLEVEL_INTERACTIVE_RESERVE", 2)
+# How long (s) a waiting interactive caller keeps bulk work off the bucket after its own wait ends
+INTERACTIVE_GRACE = 0.25
+
+
+class _RateLimiter:
+    """Token bucket per location, persisted in a locked state file so every
+    ghl-api.py process on the host draws from one budget.
+
+    The bucket holds a tenth of the burst limit and refills at the rest of it
+    per interval, so no sliding window can exceed X-RateLimit-Max while steady
+    throughput stays at ~90% of the ceiling. Rate-limit response headers retune
+    the bucket, and a 429 blocks every process until its Retry-After passes.
+
+    Bulk callers only spend tokens above INTERACTIVE_RESERVE, and stand aside
+    entirely while an interactive caller in any process is waiting, so bulk
+    work fills the spare capacity without delaying interactive requests.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._memory = {}  # per-location state when the state file can't be used
+
+    @contextlib.contextmanager
+    def _state(self, location):
+        with self._lock, _shared_state(f"ratelimit-{location or 'default'}.json",
+                                       self._memory.setdefault(location, {})) as state:
+            yield state
+
+    @staticmethod
+    def _capacity(state):
+        return max(1.0, state.get("max", BURST_MAX) / 10.0)
+
+    @classmethod
+    def _refill(cls, state, now):
+        limit = state.get("max", BURST_MAX)
+        interval = state.get("interval_ms", BURST_INTERVAL_MS) / 1000.0
+        capacity = cls._capacity(state)
+        rate = (limit - capacity) / interval
+        tokens = state.get("tokens", capacity)
+        elapsed = max(0.0, now - state.get("updated", now))
+        state["tokens"] = min(capacity, tokens + elapsed * rate)
+        state["updated"] = now
+        return rate
+
+    def acquire(self, location, priority="interactive", deadline=None):
+        """Block until a request of the given priority class may be sent. Returns an
+        error dict if the daily budget is spent or the wait would pass `deadline`."""
+        if not RATE_LIMIT_ENABLED:
+            return None
+        bulk = priority == "bulk"
+        while True:
+            with self._state(location) as state:
+                now = time.time()
+                rate = self._refill(state, now)
+                blocked = state.get("blocked_until", 0) - now
+                daily = state.get("daily_remaining")
+                # Tokens this class may not touch, and how long interactive callers still claim the bucket
+                reserve = min(INTERACTIVE_RESERVE, self._capacity(state) - 1) if bulk else 0
+                claimed = state.get("interactive_waiting_until", 0) - now if bulk else 0
+                if blocked > 0:
+                    wait = blocked
+                elif daily is not None and daily <= DAILY_RESERVE and state.get("day") == time.strftime("%Y-%m-%d", time.gmtime(now)):
+                    return {"error": "daily_limit_reached", "message": f"Only {daily} of today's API calls remain for this location."}
+                elif claimed > 0:
+                    wait = claimed
+                elif state["tokens"] >= 1 + reserve:
+                    state["tokens"] -= 1
+                    if daily is not None:
+                        state["daily_remaining"] = daily - 1
+                    return None
+                else:
+                    wait = (1 + reserve - state["tokens"]) / rate
+                if deadline is not None and time.monotonic() + wait > deadline:
+                    return _deadline_error(f"Waiting {wait:.1f}s for the rate limit would exceed the command's time budget.")
+                if not bulk:
+                    state["interactive_waiting_until"] = max(state.get("interactive_waiting_until", 0),
+                                                             now + wait + INTERACTIVE_GRACE)
+            time.sleep(min(max(wait, 0.01), 60))
+
+    def observe(self, location, headers):
+        """Retune the bucket from X-RateLimit-* response headers."""
+        if not RATE_LIMIT_ENABLED or headers is None or "X-RateLimit-Remaining" not in headers:
+            return
+
+        def num(name):
+            value = headers.get(name)
+            return int(value) if value and value.isdigit() else None
+
+        limit, interval = num("X-RateLimit-Max"), num("X-RateLimit-Interval-Milliseconds")
+        remaining, daily = num("X-RateLimit-Remaining"), num("X-RateLimit-Daily-Remaining")
+        with self._state(location) as state:
+            now = time.time()
+            if limit:
+                state["max"] = limit
+            if interval:
+                state["interval_ms"] = interval
+            self._refill(state, now)
+            if remaining is not None:
+                state["tokens"] = min(state["tokens"], float(remaining))
+            if daily is not None:
+                state["daily_remaining"] = daily
+                state["day"] = time.strftime("%Y-%m-%d", time.gmtime(now))
+            if num("X-RateLimit-Limit-Daily"):
+                state["daily_limit"] = num("X-RateLimit-Limit-Daily")
+
+    def pause(self, location, seconds):
+        """Stop all processes sending for this location for the given number of seconds."""
+        if not RATE_LIMIT_ENABLED:
+            time.sleep(seconds)
+            return
+        with self._state(location) as state:
+            now = time.time()
+            state["blocked_until"] = max(state.get("blocked_until", 0), now + seconds)
+            state["tokens"] = 0.0
+            state["updated"] = now
+
+    def status(self, location):
+        with self._state(location) as state:
+            self._refill(state, time.time())
+            return dict(state, enabled=RATE_LIMIT_ENABLED)
+
+
+_limiter = _RateLimiter()
+
+
+def rate_limit_status():
+    """Show the shared rate-limit budget for this location."""
+    return {"locationId": _loc(), **_limiter.status(_loc())}
+
+
+# ──────────────────────────────────────────────
+# Request Metrics (per endpoint template)
+# ──────────────────────────────────────────────
+
+# Upper bounds (seconds) of the per-attempt latency histogram buckets; a final +Inf bucket is implied
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+METRICS_FILE = os.environ.get("HIGHLEVEL_METRICS_FILE", "").strip()
+METRICS_FLUSH_INTERVAL = 15
+
+# Path segments that are record IDs rather than route names (route names never contain digits)
+_ID_SEGMENT = re.compile(r"^(?=.*\d)[A-Za-z0-9_-]+$|^[A-Za-z0-9_-]{20,}$")
+
+_METRIC_COUNTERS = ("calls", "coalesced", "attempts", "retries", "status_429", "status_5xx", "connection_errors",
+                    "bytes_out", "bytes_in", "latency_seconds", "backoff_seconds", "throttle_seconds")
+
+
+def _endpoint_template(method, path):
+    """"GET /contacts/{id}" for "/contacts/abc123?x=1": query dropped, ID segments masked."""
+    route = urllib.parse.urlsplit(path).path
+    return f"{method} " + "/".join("{id}" if _ID_SEGMENT.match(seg) else seg for seg in route.split("/"))
+
+
+class _Metrics:
+    """Per-endpoint request counters and latency histograms for this process.
+
+    `--stats` reports them; with HIGHLEVEL_METRICS_FILE set they are also folded
+    into cumulative totals in the state dir (shared by every process on the host)
+    and rendered to that path in Prometheus text format.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals = {}   # template -> counters for --stats
+        self._pending = {}  # template -> counters not yet folded into the metrics file
+        self._flushed = time.monotonic()
+
+    @staticmethod
+    def _new():
+        return dict({name: 0 for name in _METRIC_COUNTERS}, latency_max=0.0, buckets=[0] * (len(LATENCY_BUCKETS) + 1))
+
+    def add(self, endpoint, **amounts):
+        """Increment counters; `latency=seconds` also records one histogram observation."""
+        latency = amounts.pop("latency", None)
+        with self._lock:
+            for table in (self._totals, self._pending):
+                entry = table.get(endpoint) or table.setdefault(endpoint, self._new())
+                for name, amount in amounts.items():
+                    entry[name] += amount
+                if latency is not None:
+                    entry["latency_seconds"] += latency
+                    entry["latency_max"] = max(entry["latency_max"], latency)
+                    entry["buckets"][next((i for i, b in enumerate(LATENCY_BUCKETS) if latency <= b), -1)] += 1
+        if METRICS_FILE and time.monotonic() - self._flushed > METRICS_FLUSH_INTERVAL:
+            self.flush()
+
+    @contextlib.contextmanager
+    def timed(self, endpoint, counter):
+        """Add the wall time spent inside the block to `counter`."""
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.add(endpoint, **{counter: time.monotonic() - start})
+
+    @staticmethod
+    def _quantile(buckets, q):
+        """Estimate a latency quantile (seconds) from histogram buckets, as histogram_quantile does."""
+        count, seen = sum(buckets), 0
+        for i, n in enumerate(buckets):
+            if n and seen + n >= q * count:
+                lower = LATENCY_BUCKETS[i - 1] if i else 0.0
+                upper = LATENCY_BUCKETS[i] if i < len(LATENCY_BUCKETS) else LATENCY_BUCKETS[-1]
+                return lower + (upper - lower) * (q * count - seen) / n
+            seen += n
+        return 0.0
+
+    def snapshot(self):
+        """Per-endpoint summary for --stats, slowest total time first."""
+        with self._lock:
+            entries = sorted(self._totals.items(), key=lambda kv: -kv[1]["latency_seconds"])
+            report = {}
+            for endpoint, m in entries:
+                done = sum(m["buckets"])
+                report[endpoint] = {
+                    **{k: m[k] for k in ("calls", "coalesced", "attempts", "retries", "status_429", "status_5xx", "connection_errors", "bytes_out", "bytes_in")},
+                    "latency_ms": {
+                        "avg": round(1000 * m["latency_seconds"] / done, 1) if done else 0,
+                        "p50": round(1000 * min(self._quantile(m["buckets"], 0.5), m["latency_max"]), 1),
+                        "p95": round(1000 * min(self._quantile(m["buckets"], 0.95), m["latency_max"]), 1),
+                        "max": round(1000 * m["latency_max"], 1),
+                    },
+                    "backoff_s": round(m["backoff_seconds"], 3),
+                    "throttle_s": round(m["throttle_seconds"], 3),
+                }
+            return report
+
+    def flush(self):
+        """Fold pending counters into the shared totals and rewrite the Prometheus file."""
+        if not METRICS_FILE:
+            return
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._flushed = time.monotonic()
+        try:
+            with _locked_json(_state_path("metrics.json")) as totals:
+                for endpoint, m in pending.items():
+                    entry = totals.setdefault(endpoint, self._new())
+                    for name in _METRIC_COUNTERS:
+                        entry[name] = entry.get(name, 0) + m[name]
+                    entry["latency_max"] = max(entry.get("latency_max", 0.0), m["latency_max"])
+                    entry["buckets"] = [a + b for a, b in zip(entry.get("buckets", [0] * len(m["buckets"])), m["buckets"])]
+                text = self.prometheus(totals)
+            tmp = f"{METRICS_FILE}.tmp"
+            with open(tmp, "w") as f:
+                f.write(text)
+            os.replace(tmp, METRICS_FILE)
+        except OSError as e:
+            print(f"Could not write metrics to {METRICS_FILE}: {e}", file=sys.stderr)
+
+    @staticmethod
+    def prometheus(totals):
+        """Render cumulative per-endpoint totals in the Prometheus text exposition format."""
+        families = (
+            ("ghl_requests_total", "counter", "API calls made (a call may span several attempts).", "calls"),
+            ("ghl_requests_coalesced_total", "counter", "GETs answered by an identical call already in flight.", "coalesced"),
+            ("ghl_request_attempts_total", "counter", "HTTP attempts sent, including retries.", "attempts"),
+            ("ghl_request_retries_total", "counter", "Attempts that were retries.", "retries"),
+            ("ghl_responses_rate_limited_total", "counter", "429 responses.", "status_429"),
+            ("ghl_responses_server_error_total", "counter", "5xx responses.", "status_5xx"),
+            ("ghl_connection_errors_total", "counter", "Attempts that failed at the transport level.", "connection_errors"),
+            ("ghl_request_bytes_total", "counter", "Request body bytes sent.", "bytes_out"),
+            ("ghl_response_bytes_total", "counter", "Response body bytes received.", "bytes_in"),
+            ("ghl_backoff_seconds_total", "counter", "Time spent sleeping before retries.", "backoff_seconds"),
+            ("ghl_throttle_seconds_total", "counter", "Time spent waiting on the client-side rate limiter.", "throttle_seconds"),
+        )
+        lines = []
+
+        def labels(endpoint, extra=""):
+            method, _, route = endpoint.partition(" ")
+            return f'{{method="{method}",endpoint="{route}"{extra}}}'
+
+        for name, kind, help_text, key in families:
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+            lines += [f"{name}{labels(ep)} {m.get(key, 0)}" for ep, m in sorted(totals.items())]
+        name = "ghl_request_duration_seconds"
+        lines += [f"# HELP {name} Latency of each HTTP attempt.", f"# TYPE {name} histogram"]
+        for ep, m in sorted(totals.items()):
+            cumulative = list(itertools.accumulate(m.get("buckets", [])))
+            for bound, n in zip(LATENCY_BUCKETS + ("+Inf",), cumulative):
+                le = f',le="{bound}"'
+                lines.append(f"{name}_bucket{labels(ep, le)} {n}")
+            lines.append(f"{name}_sum{labels(ep)} {m.get('latency_seconds', 0)}")
+            lines.append(f"{name}_count{labels(ep)} {cumulative[-1] if cumulative else 0}")
+        return "\n".join(lines) + "\n"
+
+
+_metrics = _Metrics()
+_STATS_SOURCES["endpoints"] = _metrics.snapshot
+if METRICS_FILE:
+    atexit.register(_metrics.flush)
+
+
+# ──────────────────────────────────────────────
+# Request Priority (interactive vs bulk)
+# ──────────────────────────────────────────────
+
+PRIORITY_CLASSES = ("interactive", "bulk")
+
+# Latency objectives (ms) per class for one API call, including rate-limit waits and retries
+SLO_MS = {"interactive": _env_int("HIGHLEVEL_SLO_INTERACTIVE_MS", 2000),
+          "bulk": _env_int("HIGHLEVEL_SLO_BULK_MS", 30000)}
+
+# Commands that run as bulk work unless --priority says otherwise
+_BULK_COMMANDS = {"export", "bulk_write", "bulk_get", "sync", "outbox_drain"}
+
+# Priority class of API calls made in the current context (None: interactive)
+_priority = contextvars.ContextVar("ghl_priority", default=None)
+
+
+def _request_priority():
+    return _priority.get() or "interactive"
+
+
+class _PriorityStats:
+    """Per-class call latency against SLO_MS, and time spent queued on the limiter."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._classes = {}
+
+    def add(self, priority, latency=None, queued=0.0):
+        with self._lock:
+            entry = self._classes.get(priority) or self._classes.setdefault(priority, {
+                "calls": 0, "within_slo": 0, "latency_seconds": 0.0, "latency_max": 0.0,
+                "queued_seconds": 0.0, "queued_max": 0.0, "buckets": [0] * (len(LATENCY_BUCKETS) + 1)})
+            entry["queued_seconds"] += queued
+            entry["queued_max"] = max(entry["queued_max"], queued)
+            if latency is not None:
+                entry["calls"] += 1
+                entry["within_slo"] += int(1000 * latency <= SLO_MS[priority])
+                entry["latency_seconds"] += latency
+                entry["latency_max"] = max(entry["latency_max"], latency)
+                entry["buckets"][next((i for i, b in enumerate(LATENCY_BUCKETS) if latency <= b), -1)] += 1
+
+    def snapshot(self):
+        with self._lock:
+            report = {}
+            for priority, m in self._classes.items():
+                calls = m["calls"]
+                report[priority] = {
+                    "calls": calls,
+                    "slo_ms": SLO_MS[priority],
+                    "within_slo_pct": round(100.0 * m["within_slo"] / calls, 2) if calls else None,
+                    "latency_ms": {
+                        "avg": round(1000 * m["latency_seconds"] / calls, 1) if calls else 0,
+                        "p50": round(1000 * min(_Metrics._quantile(m["buckets"], 0.5), m["latency_max"]), 1),
+                        "p95": round(1000 * min(_Metrics._quantile(m["buckets"], 0.95), m["latency_max"]), 1),
+                        "p99": round(1000 * min(_Metrics._quantile(m["buckets"], 0.99), m["latency_max"]), 1),
+                        "max": round(1000 * m["latency_max"], 1),
+                    },
+                    "queued_s": round(m["queued_seconds"], 3),
+                    "queued_max_ms": round(1000 * m["queued_max"], 1),
+                }
+            return report
+
+
+_priority_stats = _PriorityStats()
+_STATS_SOURCES["priority"] = _priority_stats.snapshot
+
+
+# ──────────────────────────────────────────────
+# Request Tracing (opt-in JSONL spans)
+# ──────────────────────────────────────────────
+
+TRACE_FILE = os.environ.get("HIGHLEVEL_TRACE", "").strip()
+
+# The span new spans attach to as children in the current context
+_current_span = contextvars.ContextVar("ghl_span", default=None)
+
+
+class _Span:
+    """One timed operation: a command, a page fetch, or an HTTP attempt."""
+
+    __slots__ = ("tracer", "trace", "id", "parent", "kind", "name", "start", "attrs")
+
+    def __init__(self, tracer, kind, name, parent, attrs):
+        self.tracer, self.kind, self.name, self.attrs = tracer, kind, name, attrs
+        self.id = os.urandom(8).hex()
+        self.parent = parent.id if parent else None
+        self.trace = parent.trace if parent else os.urandom(8).hex()
+        self.start = time.time()
+
+    def end(self, **attrs):
+        end = time.time()
+        self.attrs.update(attrs)
+        self.tracer.write({"trace": self.trace, "span": self.id, "parent": self.parent, "kind": self.kind,
+                           "name": self.name, "start": round(self.start, 6), "end": round(end, 6),
+                           "duration_ms": round(1000 * (end - self.start), 3), "pid": os.getpid(), **self.attrs})
+
+
+class _Tracer:
+    """Appends finished spans as JSON lines to HIGHLEVEL_TRACE (or --trace PATH).
+
+    Spans nest through the _current_span context variable: commands contain
+    page fetches, which contain HTTP attempts. Paths are endpoint templates, so
+    no record IDs or query strings reach the file. Disabled tracing costs one
+    attribute check per span.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+        self._lock = threading.Lock()
+
+    def start(self, kind, name, parent=None, **attrs):
+        """Open a span (None when tracing is off); the caller must end() it."""
+        if not self.path:
+            return None
+        return _Span(self, kind, name, parent or _current_span.get(), attrs)
+
+    @contextlib.contextmanager
+    def span(self, kind, name, parent=None, **attrs):
+        """Trace the block as a child of `parent` (default: the current span).
+
+        Yields the span's attribute dict so the block can record its outcome."""
+        span = self.start(kind, name, parent, **attrs)
+        if span is None:
+            yield attrs
+            return
+        token = _current_span.set(span)
+        try:
+            yield span.attrs
+        except BaseException as e:
+            span.attrs.setdefault("status", type(e).__name__)
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end()
+
+    def write(self, record):
+        line = json.dumps(record, default=str) + "\n"
+        with self._lock:
+            if not self.path:
+                return
+            try:
+                if self._file is None:
+                    self._file = open(os.path.expanduser(self.path), "a", buffering=1)
+                self._file.write(line)
+            except OSError as e:
+                print(f"Tracing disabled, could not write {self.path}: {e}", file=sys.stderr)
+                self.path = ""
+
+
+_tracer = _Tracer(TRACE_FILE)
+
+
+def _traced_pages(paged, span):
+    """Keep a command's span open until its lazy listing has been consumed."""
+    fetch = paged.iter_pages
+
+    def iter_pages():
+        try:
+            yield from fetch()
+        finally:
+            span.end(status="complete" if paged.complete else "incomplete", records=paged.total, pages=paged.pages)
+
+    paged.iter_pages = iter_pages
+    return paged
+
+
+def _critical_path(span, children):
+    """The direct children that determined `span`'s end, walking back from it,
+    with consecutive steps of the same kind and name merged."""
+    steps, cursor = [], span["end"]
+    for child in sorted(children.get(span["span"], ()), key=lambda c: -c["end"]):
+        if child["end"] <= cursor + 1e-6:
+            steps.append(child)
+            cursor = child["start"]
+    merged = []
+    for child in reversed(steps):
+        if merged and (merged[-1]["kind"], merged[-1]["name"]) == (child["kind"], child["name"]):
+            merged[-1]["count"] += 1
+            merged[-1]["duration_ms"] = round(merged[-1]["duration_ms"] + child["duration_ms"], 3)
+        else:
+            merged.append({"kind": child["kind"], "name": child["name"], "count": 1, "duration_ms": child["duration_ms"]})
+    return merged
+
+
+def trace_report(path=None, *options):
+    """Summarize a trace file: where each command's time went, the critical path
+    of the slowest commands, and the slowest individual spans (--top N, default 10).
+
+    `fetch_share` is the part of a command spent waiting on page fetches or HTTP
+    calls; `pipelinable_ms` is how much of that (after the first page) could have
+    overlapped with the processing done between fetches.
+    """
+    opts = dict(zip(options[::2], options[1::2]))
+    top = max(1, int(opts.get("--top") or 10))
+    path = os.path.expanduser(path or TRACE_FILE)
+    if not path:
+        return {"error": "bad_input", "message": "Pass a trace file or set HIGHLEVEL_TRACE."}
+    spans = []
+    try:
+        with open(path) as f:
+            for line in f:
+                try:
+                    spans.append(json.loads(line))
+                except ValueError:
+                    continue  # a torn final line from a killed process
+    except OSError as e:
+        return {"error": "bad_input", "message": str(e)}
+
+    children = {}
+    for span in spans:
+        children.setdefault(span.get("parent"), []).append(span)
+    commands = [s for s in spans if s["kind"] == "command"]
+
+    by_command = {}
+    for cmd in commands:
+        fetches = sorted(children.get(cmd["span"], ()), key=lambda c: c["start"])
+        fetch_ms = sum(c["duration_ms"] for c in fetches)
+        idle_ms = max(0.0, cmd["duration_ms"] - fetch_ms)
+        pages = [c for c in fetches if c["kind"] == "page"]
+        attempts = [h for c in fetches for h in ([c] if c["kind"] == "http" else children.get(c["span"], ())) if h["kind"] == "http"]
+        entry = by_command.setdefault(cmd["name"], {"runs": 0, "total_ms": 0.0, "max_ms": 0.0, "fetch_ms": 0.0,
+                                                    "pages": 0, "http_attempts": 0, "retries": 0, "pipelinable_ms": 0.0})
+        entry["runs"] += 1
+        entry["total_ms"] += cmd["duration_ms"]
+        entry["max_ms"] = max(entry["max_ms"], cmd["duration_ms"])
+        entry["fetch_ms"] += fetch_ms
+        entry["pages"] += len(pages)
+        entry["http_attempts"] += len(attempts)
+        entry["retries"] += sum(1 for h in attempts if (h.get("attempt") or 1) > 1)
+        entry["pipelinable_ms"] += min(sum(p["duration_ms"] for p in pages[1:]), idle_ms)
+    for entry in by_command.values():
+        entry["fetch_share"] = round(entry["fetch_ms"] / entry["total_ms"], 3) if entry["total_ms"] else 0
+        entry["avg_ms"] = round(entry["total_ms"] / entry["runs"], 3)
+        for key in ("total_ms", "max_ms", "fetch_ms", "pipelinable_ms"):
+            entry[key] = round(entry[key], 3)
+
+    slowest_commands = sorted(commands, key=lambda c: -c["duration_ms"])[:top]
+    return {
+        "file": path,
+        "spans": len(spans),
+        "traces": len({s["trace"] for s in spans}),
+        "commands": dict(sorted(by_command.items(), key=lambda kv: -kv[1]["total_ms"])),
+        "critical_paths": [{"command": c["name"], "trace": c["trace"], "duration_ms": c["duration_ms"],
+                            "status": c.get("status"), "path": _critical_path(c, children)} for c in slowest_commands],
+        "slowest_spans": [{k: s.get(k) for k in ("kind", "name", "duration_ms", "status", "attempt", "page", "trace")}
+                          for s in sorted((s for s in spans if s["kind"] != "command"), key=lambda s: -s["duration_ms"])[:top]],
+    }
+
+
+# ──────────────────────────────────────────────
+# Retry Policy (jittered backoff, deadlines, circuit breakers)
+# ──────────────────────────────────────────────
+
+# Attempts per API call, including the first
+MAX_RETRIES = max(1, _env_int("HIGHLEVEL_MAX_ATTEMPTS", 3))
+# Decorrelated-jitter backoff: each sleep is uniform in [base, 3 x previous sleep], capped
+RETRY_BASE_S = _env_float("HIGHLEVEL_RETRY_BASE", 0.5)
+RETRY_CAP_S = _env_float("HIGHLEVEL_RETRY_CAP", 20.0)
+# Longest Retry-After honored before a 429 is returned to the caller instead
+RETRY_AFTER_MAX_S = _env_float("HIGHLEVEL_RETRY_AFTER_MAX", 60.0)
+
+# Total seconds an interactive command may spend on API calls, waits and retries (0: no limit).
+# Bulk commands are unbounded unless --deadline is given.
+COMMAND_DEADLINE_S = _env_float("HIGHLEVEL_DEADLINE", 60.0)
+
+BREAKERS_ENABLED = _env_flag("HIGHLEVEL_CIRCUIT_BREAKERS")
+# Consecutive failures (5xx or transport errors) that open an endpoint group's breaker
+BREAKER_THRESHOLD = _env_int("HIGHLEVEL_BREAKER_THRESHOLD", 5)
+# Seconds an open breaker fails fast before letting one probe request through
+BREAKER_COOLDOWN_S = _env_float("HIGHLEVEL_BREAKER_COOLDOWN", 30.0)
+
+# time.monotonic() by which the current command must finish; None: not set yet, inf: no limit
+_deadline = contextvars.ContextVar("ghl_deadline", default=None)
+
+
+def _remaining():
+    """Seconds left in the current command's time budget, or None when it has none."""
+    deadline = _deadline.get()
+    return None if deadline is None or deadline == float("inf") else deadline - time.monotonic()
+
+
+def _deadline_error(message):
+    return {"error": "deadline_exceeded", "message": message}
+
+
+def _backoff(previous):
+    """Next decorrelated-jitter sleep after `previous` (None before the first retry)."""
+    return min(RETRY_CAP_S, random.uniform(RETRY_BASE_S, 3 * (previous or RETRY_BASE_S)))
+
+
+def _endpoint_group(endpoint):
+    """"contacts" for "GET /contacts/{id}/notes": breakers trip per top-level resource."""
+    route = endpoint.partition(" ")[2].strip("/")
+    return route.split("/", 1)[0] or "/"
+
+
+class _CircuitBreakers:
+    """Per-endpoint-group breakers, persisted in the state dir so every process
+    fails fast together while GHL is unhealthy.
+
+    A group opens after BREAKER_THRESHOLD consecutive 5xx or transport
+    failures. While open, calls to it return circuit_open at once. After
+    BREAKER_COOLDOWN_S one probe request is let through (half-open): success
+    closes the breaker, failure reopens it for another cooldown.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._memory = {}  # breaker state when the state file can't be used
+        self._tracked = set()  # groups with a state-file entry, so healthy calls skip the write
+        self.counts = {"rejected": 0, "opened": 0, "probes": 0}
+
+    @contextlib.contextmanager
+    def _state(self):
+        with self._lock, _shared_state("circuit-breakers.json", self._memory) as state:
+            yield state
+
+    def allow(self, group):
+        """None if a request to `group` may go out, otherwise a circuit_open error."""
+        if not BREAKERS_ENABLED:
+            return None
+        with self._state() as state:
+            breaker = state.get(group)
+            if not breaker:
+                self._tracked.discard(group)
+                return None
+            self._tracked.add(group)
+            if breaker["state"] == "closed":
+                return None
+            now = time.time()
+            wait = max(breaker["open_until"], breaker.get("probe_until", 0)) - now
+            if wait <= 0:
+                # Cooldown over and no probe in flight: this call is the probe
+                breaker.update(state="half_open", probe_until=now + REQUEST_TIMEOUT)
+                self.counts["probes"] += 1
+                return None
+            self.counts["rejected"] += 1
+        return {"error": "circuit_open", "retry_after": round(wait, 1),
+                "message": f"GHL '{group}' endpoints are failing; not retrying for {wait:.0f}s."}
+
+    def record(self, group, failed):
+        """Feed one attempt's outcome into the group's breaker."""
+        if not BREAKERS_ENABLED or (not failed and group not in self._tracked):
+            return
+        with self._state() as state:
+            if not failed:
+                state.pop(group, None)
+                self._tracked.discard(group)
+                return
+            self._tracked.add(group)
+            now = time.time()
+            breaker = state.setdefault(group, {"state": "closed", "failures": 0, "open_until": 0})
+            if breaker["state"] == "closed" and now - breaker.get("last_failure", now) > BREAKER_COOLDOWN_S:
+                breaker["failures"] = 0  # old failures are no longer "consecutive"
+            breaker["failures"] += 1
+            breaker["last_failure"] = now
+            if breaker["state"] == "half_open" or breaker["failures"] >= BREAKER_THRESHOLD:
+                if breaker["state"] != "open":
+                    self.counts["opened"] += 1
+                breaker.update(state="open", open_until=now + BREAKER_COOLDOWN_S, probe_until=0)
+
+    def status(self):
+        """Breakers that are not plainly healthy, with seconds until each may be probed."""
+        with self._state() as state:
+            now = time.time()
+            groups = {group: {"state": b["state"], "failures": b["failures"],
+                              "retry_in_s": round(max(0.0, b["open_until"] - now), 1)}
+                      for group, b in state.items()}
+        return {"enabled": BREAKERS_ENABLED, **self.counts, "groups": groups}
+
+
+_breakers = _CircuitBreakers()
+_STATS_SOURCES["circuit_breakers"] = _breakers.status
+
 
 # ──────────────────────────────────────────────
-# HTTP Client (native urllib.request)
+# HTTP Client (pooled http.client)
 # ──────────────────────────────────────────────
 
+def _json_loads(raw):
+    """Decode a JSON response body (bytes or str) with the fastest available backend."""
+    return orjson.loads(raw) if orjson is not None else json.loads(raw)
+
+
+def _json_compact(data):
+    """One-line JSON text, UTF-8 rather than \\u-escaped; orjson when available."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(data).decode()
+        except TypeError:
+            pass  # e.g. integers beyond 64 bits; the stdlib handles those
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+
+
 def _headers():
     return {
-        "Authorization": f"Bearer {TOKEN}",
+        "Authorization": f"Bearer {_token()}",
         "Version": VERSION,
         "Content-Type": "application/json",
         "Accept": "application/json",
@@ -59,45 +1071,198 @@ def _headers():
     }
 
 
-def _request(method, path, body=None, retries=MAX_RETRIES):
-    """Make API request using native urllib with retry logic for 429/5xx errors."""
-    url = f"{BASE}{path}" if path.startswith("/") else f"{BASE}/{path}"
-    data = json.dumps(body).encode() if body else None
+# Identical GETs issued while one is already in flight share its response (HIGHLEVEL_SINGLE_FLIGHT=off to disable)
+SINGLE_FLIGHT_ENABLED = _env_flag("HIGHLEVEL_SINGLE_FLIGHT")
 
-    for attempt in range(retries):
+
+class _SingleFlight:
+    """Coalesces identical concurrent calls: the first caller (the leader) makes
+    the request and every caller that arrives while it is in flight waits for
+    that result instead of sending its own. Followers get a deep copy, taken
+    before the leader returns, so no caller can see another's mutations.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.counts = {"leaders": 0, "coalesced": 0}
+
+    def do(self, key, fn, info=None, on_coalesced=None):
+        """Run fn(info_dict) once per concurrent `key`; `info` receives the shared info.
+        `on_coalesced` is called when this caller joins a call already in flight.
+        A follower waits no longer than its own deadline."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = {"done": threading.Event(), "followers": 0}
+                self.counts["leaders"] += 1
+            else:
+                call["followers"] += 1
+                self.counts["coalesced"] += 1
+        if not leader:
+            if on_coalesced:
+                on_coalesced()
+            remaining = _remaining()
+            if not call["done"].wait(None if remaining is None else max(0.0, remaining)):
+                return _deadline_error("Time budget ran out waiting for an identical request in flight.")
+            if "error" in call:
+                raise call["error"]
+            if info is not None:
+                info.update(call["info"])
+            return copy.deepcopy(call["snapshot"])
+
+        shared = {}
         try:
-            req = urllib.request.Request(url, data=data, headers=_headers(), method=method)
-            with urllib.request.urlopen(req, timeout=30) as resp:
-                raw = resp.read().decode()
-                return json.loads(raw) if raw else {"status": resp.status}
-        except urllib.error.HTTPError as e:
-            err_body = ""
-            try:
-                err_body = e.read().decode() if e.fp else ""
-            except Exception:
-                pass
-
-            # Retry on rate-limit (429) with exponential backoff
-            if e.code == 429 and attempt < retries - 1:
-                retry_after = e.headers.get("Retry-After")
-                wait = int(retry_after) if retry_after and retry_after.isdigit() else 2 ** (attempt + 1)
-                print(f"Rate limited (429). Retrying in {wait}s...", file=sys.stderr)
-                time.sleep(wait)
-                continue
+            result = fn(shared)
+        except BaseException as e:
+            call["error"] = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+                followers = call["followers"]
+            if followers and "error" not in call:
+                call["snapshot"], call["info"] = copy.deepcopy(result), shared
+            call["done"].set()
+        if info is not None:
+            info.update(shared)
+        return result
 
-            # Retry on server errors (5xx)
-            if e.code >= 500 and attempt < retries - 1:
-                time.sleep(2 ** attempt)
-                continue
 
-            return {"error": e.code, "message": err_body}
-        except urllib.error.URLError as e:
-            if attempt < retries - 1:
-                time.sleep(2)
-                continue
-            return {"error": "connection_failed", "message": str(e.reason)}
+_single_flight = _SingleFlight()
+_STATS_SOURCES["single_flight"] = lambda: dict(_single_flight.counts)
+
+
+def _request(method, path, body=None, retries=MAX_RETRIES, headers=None, info=None, idempotent=False):
+    """Make API request over the keep-alive pool with retry logic for 429/5xx errors.
+
+    `headers` are merged over the defaults; if `info` is a dict it receives the
+    final response's `status` and `headers` (used for conditional requests).
+    GETs are retried after any failure; other methods only when `idempotent`
+    (a read sent as POST, like a search), since GHL may already have acted on them.
+    Concurrent identical GETs share one call; writes are never coalesced.
+    Each call's latency is recorded against its priority class's SLO.
+    """
+    started = time.monotonic()
+    try:
+        if method != "GET" or not SINGLE_FLIGHT_ENABLED:
+            return _send(method, path, body, retries, headers, info, idempotent)
+        # Priority is part of the key so an interactive call never waits in a bulk leader's lane
+        key = (path, _token(), _request_priority(), tuple(sorted((headers or {}).items())))
+        coalesced = []
+
+        def joined():
+            coalesced.append(True)
+            _metrics.add(_endpoint_template(method, path), coalesced=1)
+
+        result = _single_flight.do(key, lambda shared: _send(method, path, body, retries, headers, shared), info,
+                                   on_coalesced=joined)
+        if coalesced and isinstance(result, dict) and result.get("error") == "deadline_exceeded":
+            # The leader ran out of its own budget; this caller may still have time for its own try
+            remaining = _remaining()
+            if remaining is None or remaining > 0:
+                return _send(method, path, body, retries, headers, info)
+        return result
+    finally:
+        _priority_stats.add(_request_priority(), latency=time.monotonic() - started)
+
+
+def _send(method, path, body, retries, headers, info, idempotent=False):
+    url = f"{BASE}{path}" if path.startswith("/") else f"{BASE}/{path}"
+    data = _json_compact(body).encode() if body else None
+    req_headers = {**_headers(), **(headers or {})}
+
+    endpoint = _endpoint_template(method, path)
+    _metrics.add(endpoint, calls=1)
+    priority = _request_priority()
+    group = _endpoint_group(endpoint)
+    # A 429 pauses the shared limiter, so the wait that follows shows up in acquire()
+    idempotent = idempotent or method in _RETRY_SAFE_METHODS
+    waiting = "throttle_seconds"
+    delay = None  # previous backoff sleep, for decorrelated jitter
+    # Set once an attempt reached GHL and may have been acted on (a 429 was refused outright);
+    # errors returned on a later attempt then carry request_sent so callers don't assume nothing ran
+    sent = False
+
+    for attempt in range(retries):
+        tripped = _breakers.allow(group)
+        if tripped:
+            return {**tripped, "request_sent": True} if sent else tripped
+        queued = time.monotonic()
+        blocked = _limiter.acquire(_loc(), priority, _deadline.get())
+        queued = time.monotonic() - queued
+        _metrics.add(endpoint, **{waiting: queued})
+        _priority_stats.add(priority, queued=queued)
+        if blocked:
+            return {**blocked, "request_sent": True} if sent else blocked
+        waiting = "throttle_seconds"
+        remaining = _remaining()
+        if remaining is not None and remaining <= 0:
+            error = _deadline_error("The command's time budget ran out before the request was sent.")
+            return {**error, "request_sent": True} if sent else error
+        started = time.monotonic()
+        parent = _current_span.get()
+        span = _tracer.start("http", endpoint, parent, attempt=attempt + 1,
+                             page=parent.attrs.get("page") if parent else None)
+        try:
+            status, resp_headers, raw = _pool.request(method, url, data, req_headers, timeout=remaining, idempotent=idempotent)
+        except (OSError, http.client.HTTPException) as e:
+            if span:
+                span.end(status="connection_error")
+            _metrics.add(endpoint, attempts=1, retries=int(attempt > 0), connection_errors=1, bytes_out=len(data or b""))
+            _breakers.record(group, failed=True)
+            status, error = None, {"error": "connection_failed", "message": str(e)}
+            # GHL may already be acting on a write that failed mid-request (e.g. a read timeout): never resend it
+            if not idempotent and getattr(e, "request_sent", True):
+                return error
         except Exception as ex:
             return {"error": "unexpected", "message": str(ex)}
+        else:
+            if span:
+                span.end(status=status, bytes_in=len(raw))
+            _metrics.add(endpoint, latency=time.monotonic() - started, attempts=1, retries=int(attempt > 0),
+                         status_429=int(status == 429), status_5xx=int(status >= 500),
+                         bytes_out=len(data or b""), bytes_in=len(raw))
+            _breakers.record(group, failed=status >= 500)
+            _limiter.observe(_loc(), resp_headers)
+            if info is not None:
+                info.update(status=status, headers=resp_headers)
+            if status < 400:
+                try:
+                    return _json_loads(raw) if raw.strip() else {"status": status}
+                except Exception as ex:
+                    return {"error": "unexpected", "message": str(ex)}
+            error = {"error": status, "message": raw.decode(errors="replace")}
+            sent = sent or status != 429
+            # Only rate limits (429) and server errors (5xx) are worth retrying, and a write that
+            # got a 5xx reached GHL, which may have acted on it: only a 429 is sure to be unapplied
+            if status >= 500 and not idempotent:
+                return {**error, "request_sent": True}
+            if status != 429 and status < 500:
+                return error
+
+        if attempt == retries - 1:
+            return error
+        retry_after = resp_headers.get("Retry-After") if status == 429 else None
+        if retry_after and retry_after.isdigit():
+            wait = int(retry_after)
+            if wait > RETRY_AFTER_MAX_S:
+                return error
+        else:
+            wait = delay = _backoff(delay)
+        remaining = _remaining()
+        if remaining is not None and wait >= remaining:
+            return {**_deadline_error(f"Retrying after {error['error']} needs a {wait:.1f}s wait, past the command's time budget."),
+                    "last_error": error, **({"request_sent": True} if sent else {})}
+        if status == 429:
+            print(f"Rate limited (429). Retrying in {wait:.1f}s...", file=sys.stderr)
+            with _metrics.timed(endpoint, "backoff_seconds"):
+                _limiter.pause(_loc(), wait)
+            waiting = "backoff_seconds"
+        else:
+            with _metrics.timed(endpoint, "backoff_seconds"):
+                time.sleep(wait)
 
     return {"error": "max_retries_exceeded"}
 
@@ -106,8 +1271,8 @@ def _get(path):
     return _request("GET", path)
 
 
-def _post(path, body=None):
-    return _request("POST", path, body)
+def _post(path, body=None, idempotent=False):
+    return _request("POST", path, body, idempotent=idempotent)
 
 
 def _put(path, body=None):
@@ -118,6 +1283,174 @@ def _delete(path):
     return _request("DELETE", path)
 
 
+# Pages a listing fetches ahead of its consumer on a background thread (0 fetches in step)
+PREFETCH_PAGES = _env_int("HIGHLEVEL_PREFETCH_PAGES", 1)
+
+# When set (the CLI does), list commands return a lazy _Paged stream instead of a dict
+_streaming = contextvars.ContextVar("ghl_streaming", default=False)
+
+# Overrides applied to every _get_paginated call in the current context (used by export)
+_paging = contextvars.ContextVar("ghl_paging", default=None)
+
+
+class _Paged:
+    """Lazy cursor-paginated result. Iterating yields records as each page arrives,
+    so a full listing runs in constant memory; totals are known once exhausted.
+
+    After each page, `cursor` holds the (startAfter, startAfterId) pair for the
+    next one, so a consumer can persist it and resume later via `start`.
+    `complete` is only True once the API reports no further pages.
+    """
+
+    def __init__(self, endpoint_base, params=None, max_pages=50, start=None):
+        self.endpoint = endpoint_base
+        self.credentials = (_token(), _loc())
+        self.priority = _priority.get()
+        self.deadline = _deadline.get()
+        self.params = {"locationId": _loc(), "limit": "100"}
+        if params:
+            self.params.update({k: str(v) for k, v in params.items()})
+        self.max_pages = max_pages
+        self.cursor = tuple(start) if start else None
+        self.item_key = None
+        self.pages = 0
+        self.total = 0
+        self.error = None
+        self.complete = False
+        self.truncated = False
+        self.parent_span = _current_span.get()
+
+    def _fetch(self, cursor, page):
+        """GET the page after `cursor`; returns (data, next_cursor), next_cursor None on the last page."""
+        url_params = self.params.copy()
+        if cursor:
+            url_params["startAfter"], url_params["startAfterId"] = cursor
+
+        # Fetch with the credentials, priority and deadline the listing was created under, whichever context consumes it
+        token, priority, deadline = (_credentials.set(self.credentials), _priority.set(self.priority),
+                                     _deadline.set(self.deadline))
+        try:
+            with _tracer.span("page", _endpoint_template("GET", self.endpoint), self.parent_span, page=page) as span:
+                data = _get(f"{self.endpoint}?{urllib.parse.urlencode(url_params)}")
+                span["status"] = "error" if "error" in data else "ok"
+        finally:
+            _deadline.reset(deadline)
+            _priority.reset(priority)
+            _credentials.reset(token)
+        if "error" in data:
+            return data, None
+
+        meta = data.get("meta", {})
+        start_after = meta.get("startAfter")
+        start_after_id = meta.get("startAfterId")
+        if meta.get("nextPageUrl") and start_after and start_after_id:
+            return data, (start_after, start_after_id)
+        return data, None
+
+    def _fetch_pages(self):
+        """Fetch pages one after another from the current cursor, yielding (data, next_cursor)."""
+        cursor, page = self.cursor, self.pages
+        while True:
+            page += 1
+            data, cursor = self._fetch(cursor, page)
+            yield data, cursor
+            if cursor is None:
+                return
+
+    def _prefetch_pages(self, limit):
+        """_fetch_pages on a background thread that runs up to PREFETCH_PAGES ahead.
+
+        The next request goes out as soon as the previous page's cursor is known,
+        so the network stays busy while the consumer decodes and writes records.
+        Stops after `limit` pages (None: no limit) or once the consumer goes away.
+        """
+        buffer = queue.Queue(maxsize=PREFETCH_PAGES)
+        stop = threading.Event()
+        done = object()
+
+        def offer(item):
+            while not stop.is_set():
+                try:
+                    buffer.put(item, timeout=0.2)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def produce():
+            try:
+                for fetched, item in enumerate(self._fetch_pages(), 1):
+                    if not offer(item) or (limit is not None and fetched >= limit):
+                        break
+            except Exception as e:
+                offer(({"error": "unexpected", "message": str(e)}, None))
+            finally:
+                offer(done)
+
+        # Copy the context so tracing and rate limiting see the same location and spans
+        threading.Thread(target=contextvars.copy_context().run, args=(produce,),
+                         name="ghl-prefetch", daemon=True).start()
+        try:
+            while True:
+                item = buffer.get()
+                if item is done:
+                    return
+                yield item
+        finally:
+            stop.set()
+
+    def iter_pages(self):
+        """Yield each page's list of records in order."""
+        remaining = None if self.max_pages is None else self.max_pages - self.pages
+        if PREFETCH_PAGES > 0 and (remaining is None or remaining > 1):
+            fetched = self._prefetch_pages(remaining)
+        else:
+            fetched = self._fetch_pages()
+
+        for data, next_cursor in fetched:
+            if "error" in data:
+                self.error = data
+                return
+            self.pages += 1
+
+            # Detect item key from first response
+            if self.item_key is None:
+                for key in data:
+                    if key not in ("meta", "traceId") and isinstance(data[key], list):
+                        self.item_key = key
+                        break
+
+            items = data.get(self.item_key, []) if self.item_key else []
+            self.total += len(items)
+
+            # Cursor state follows what has been yielded, not what has been prefetched
+            self.cursor = next_cursor
+            self.complete = next_cursor is None
+            yield items
+
+            if self.complete:
+                return
+            if self.max_pages is not None and self.pages >= self.max_pages:
+                self.truncated = True
+                return
+
+    def __iter__(self):
+        for page in self.iter_pages():
+            yield from page
+
+    def summary(self):
+        result = {"total": self.total, "pages": self.pages, "endpoint": self.endpoint, "complete": self.complete}
+        if self.truncated:
+            result["truncated"] = f"Stopped at max_pages={self.max_pages}; use the export command for everything."
+        if self.error:
+            result["error"] = self.error
+        return result
+
+    def to_dict(self):
+        items = list(self)
+        return {self.item_key or "items": items, **self.summary()}
+
+
 def _get_paginated(endpoint_base, params=None, max_pages=50):
     """Automatically paginate through all results using cursor pagination.
 
@@ -127,63 +1460,437 @@ def _get_paginated(endpoint_base, params=None, max_pages=50):
         max_pages: Safety limit (default 50 = 5000 records max)
 
     Returns:
-        Dict with all results, total count, and pages fetched
+        Dict with all results, total count, pages fetched and whether the
+        listing is complete — or, when streaming output, a lazy _Paged that
+        yields records page by page
+    """
+    overrides = _paging.get() or {}
+    paged = _Paged(endpoint_base, params, overrides.get("max_pages", max_pages), overrides.get("start"))
+    return paged if _streaming.get() or overrides else paged.to_dict()
+
+
+# Output format for _out: "pretty" (indented JSON, the default), "compact" (the same
+# document on one line), "ndjson" (one compact record per line) or "csv" (records only)
+OUTPUT_FORMATS = ("pretty", "compact", "ndjson", "csv")
+OUTPUT_FORMAT = "pretty"
+
+
+def _records(data):
+    """The record list of a single-collection response, or None."""
+    lists = [k for k, v in data.items() if k not in ("meta", "traceId") and isinstance(v, list)]
+    return data[lists[0]] if len(lists) == 1 else None
+
+
+def _write_paged(paged, out):
+    """Stream a _Paged as the same indented JSON document to_dict() would produce."""
+    pages = paged.iter_pages()
+    first = next(pages, [])  # fetch page 1 so the item key is known
+    out.write(f"{{\n  {json.dumps(paged.item_key or 'items')}: [")
+    sep = "\n"
+    for page in itertools.chain([first], pages):
+        for item in page:
+            out.write(sep + "    " + json.dumps(item, indent=2).replace("\n", "\n    "))
+            sep = ",\n"
+        out.flush()
+    out.write("\n  ]," if sep != "\n" else "],")
+    out.write("\n" + json.dumps(paged.summary(), indent=2)[2:] + "\n")
+
+
+def _write_paged_compact(paged, out):
+    """Stream a _Paged as to_dict() on a single line, one page at a time."""
+    pages = paged.iter_pages()
+    first = next(pages, [])
+    out.write(f"{{{_json_compact(paged.item_key or 'items')}:[")
+    sep = ""
+    for page in itertools.chain([first], pages):
+        if page:
+            out.write(sep + ",".join(map(_json_compact, page)))
+            sep = ","
+        out.flush()
+    out.write("]," + _json_compact(paged.summary())[1:] + "\n")
+
+
+def _field_value(record, path):
+    """Resolve a dotted field path in a record.
+
+    On a list, a numeric part indexes it and any other part selects the element
+    whose id, key, fieldKey or name matches, yielding that element's value. So
+    "customFields.<field_id>" is a custom field's value and "tags.0" the first tag.
     """
-    all_items = []
-    start_after = None
-    start_after_id = None
-    page = 1
-    item_key = None
+    value = record
+    for part in path:
+        if isinstance(value, dict):
+            value = value.get(part)
+        elif isinstance(value, list):
+            if part.isdigit():
+                value = value[int(part)] if int(part) < len(value) else None
+            else:
+                match = next((v for v in value if isinstance(v, dict) and part in (v.get("id"), v.get("key"), v.get("fieldKey"), v.get("name"))), None)
+                value = match.get("value", match.get("fieldValue", match)) if match is not None else None
+        else:
+            return None
+        if value is None:
+            return None
+    return value
+
+
+def _projection(fields):
+    """Build a function mapping a record to a flat {field: value} dict of just `fields`."""
+    paths = [(name, name.split(".")) for name in fields]
+    return lambda record: {name: _field_value(record, path) for name, path in paths}
+
+
+def _map_pages(data, transform):
+    """Apply `transform` to each page of listed records, lazily for a _Paged stream;
+    results without a record list pass through unchanged."""
+    if isinstance(data, _Paged):
+        fetch = data.iter_pages
+
+        def iter_pages():
+            for page in fetch():
+                yield transform(page)
+
+        data.iter_pages = iter_pages
+        return data
+    records = _records(data) if isinstance(data, dict) else None
+    if records is None:
+        return data
+    key = next(k for k, v in data.items() if v is records)
+    return {**data, key: transform(records)}
+
+
+def _project(data, fields):
+    """Keep only `fields` of each listed record; a lazy listing is projected page by page."""
+    project = _projection(fields)
+    # Per-record error entries (bulk_get, fan-out) pass through whole so the reason isn't projected away
+    return _map_pages(data, lambda page: [record if "error" in record else project(record) for record in page])
+
+
+def _csv_cell(value):
+    if value is None:
+        return ""
+    if isinstance(value, list) and all(isinstance(v, (str, int, float)) and not isinstance(v, bool) for v in value):
+        return ",".join(map(str, value))
+    if isinstance(value, (dict, list, bool)):
+        return _json_compact(value)
+    return value
+
+
+def _write_csv(data, out, fields=None):
+    """Write the records of a result as CSV: a header row (`fields`, else the first
+    record's keys), lists of scalars comma-joined and nested objects as JSON."""
+    if isinstance(data, _Paged):
+        pages = data.iter_pages()
+    else:
+        records = _records(data) if isinstance(data, dict) else None
+        pages = iter([records if records is not None else [data]])
+    writer = csv.writer(out, lineterminator="\n")
+    columns = list(fields) if fields else None
+    if columns:
+        writer.writerow(columns)
+    for page in pages:
+        for record in page:
+            if columns is None:
+                columns = list(record)
+                writer.writerow(columns)
+            writer.writerow([_csv_cell(record.get(c)) for c in columns])
+        out.flush()
+    if isinstance(data, _Paged) and data.error:
+        print(_json_compact(data.error), file=sys.stderr)
+
+
+def _out(data, out=None, fields=None):
+    """Print a result in OUTPUT_FORMAT, keeping only `fields` of listed records if given."""
+    out = out or sys.stdout
+    if CUSTOM_FIELD_NAMES:
+        data = _annotate_custom_fields(data)
+    if fields:
+        data = _project(data, fields)
+    if OUTPUT_FORMAT == "csv" and not (isinstance(data, dict) and "error" in data):
+        _write_csv(data, out, fields)
+        return
+    if OUTPUT_FORMAT == "ndjson":
+        if isinstance(data, _Paged):
+            for page in data.iter_pages():
+                out.writelines(_json_compact(item) + "\n" for item in page)
+                out.flush()
+            if data.error:
+                print(_json_compact(data.error), file=sys.stderr)
+            return
+        records = _records(data) if isinstance(data, dict) else None
+        for item in (records if records is not None else [data]):
+            out.write(_json_compact(item) + "\n")
+        return
+    if OUTPUT_FORMAT == "compact":
+        if isinstance(data, _Paged):
+            _write_paged_compact(data, out)
+        else:
+            out.write(_json_compact(data) + "\n")
+        return
+    if isinstance(data, _Paged):
+        _write_paged(data, out)
+        return
+    out.write(json.dumps(data, indent=2) + "\n")
 
-    base_params = {"locationId": LOC_ID, "limit": "100"}
-    if params:
-        base_params.update({k: str(v) for k, v in params.items()})
 
-    while page <= max_pages:
-        url_params = base_params.copy()
-        if start_after and start_after_id:
-            url_params["startAfter"] = start_after
-            url_params["startAfterId"] = start_after_id
+# ──────────────────────────────────────────────
+# Response Cache (slow-changing metadata)
+# ──────────────────────────────────────────────
 
-        query_string = urllib.parse.urlencode(url_params)
-        path = f"{endpoint_base}?{query_string}"
-        data = _get(path)
+CACHE_ENABLED = _env_flag("HIGHLEVEL_CACHE")
 
-        if "error" in data:
-            break
+# Seconds each endpoint group is served from cache before revalidating;
+# override per group with HIGHLEVEL_CACHE_TTL_<GROUP>, e.g. HIGHLEVEL_CACHE_TTL_PIPELINES=60
+CACHE_TTLS = {
+    group: _env_int(f"HIGHLEVEL_CACHE_TTL_{group.upper()}", ttl)
+    for group, ttl in {
+        "pipelines": 300, "calendars": 300, "custom_fields": 3600,
+        "tags": 600, "users": 3600, "location": 3600,
+    }.items()
+}
 
-        # Detect item key from first response
-        if item_key is None:
-            for key in data:
-                if key not in ("meta", "traceId") and isinstance(data[key], list):
-                    item_key = key
-                    break
+_cache_counts = {"hits": 0, "misses": 0, "revalidated": 0}
+_cache_lock = threading.Lock()
 
-        if item_key:
-            items = data.get(item_key, [])
-            all_items.extend(items)
 
-        # Check for next page
-        meta = data.get("meta", {})
-        if not meta.get("nextPageUrl"):
-            break
+def _cache_dir():
+    path = _state_path("cache")
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    return path
 
-        start_after = meta.get("startAfter")
-        start_after_id = meta.get("startAfterId")
-        if not start_after or not start_after_id:
-            break
-        page += 1
 
+def _cache_count(outcome):
+    with _cache_lock:
+        _cache_counts[outcome] += 1
+    try:
+        with _locked_json(os.path.join(_cache_dir(), "stats.json")) as totals:
+            totals[outcome] = totals.get(outcome, 0) + 1
+    except OSError:
+        pass
+
+
+def _cached_get(path, group, max_age=None, error_ttl=None):
+    """GET through the on-disk cache: fresh entries are served locally, stale ones
+    are revalidated with If-None-Match / If-Modified-Since when the API sent validators.
+    `max_age` overrides the group's TTL (0 always revalidates). With `error_ttl`, an
+    error response is cached too, for that many seconds. Without a usable state
+    directory this is a plain GET."""
+    if not CACHE_ENABLED:
+        return _get(path)
+    try:
+        file = os.path.join(_cache_dir(), hashlib.sha1(f"{_loc()}|{path}".encode()).hexdigest() + ".json")
+    except OSError:
+        return _get(path)
+    entry = None
+    try:
+        with open(file) as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        pass
+
+    ttl = CACHE_TTLS[group] if max_age is None else max_age
+    if entry and time.time() - entry["stored_at"] < min(ttl, entry.get("error_ttl") or ttl):
+        _cache_count("hits")
+        return entry["body"]
+
+    conditional = {}
+    if entry and entry.get("etag"):
+        conditional["If-None-Match"] = entry["etag"]
+    if entry and entry.get("last_modified"):
+        conditional["If-Modified-Since"] = entry["last_modified"]
+    info = {}
+    data = _request("GET", path, headers=conditional, info=info)
+
+    if info.get("status") == 304 and entry:
+        _cache_count("revalidated")
+    elif "error" in data:
+        if error_ttl is None:
+            return data
+        entry = {"group": group, "location": _loc(), "path": path, "body": data, "error_ttl": error_ttl}
+    else:
+        _cache_count("misses")
+        headers = info.get("headers") or {}
+        entry = {"group": group, "location": _loc(), "path": path, "body": data,
+                 "etag": headers.get("ETag"), "last_modified": headers.get("Last-Modified")}
+    entry["stored_at"] = time.time()
+    tmp = f"{file}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "w") as f:
+            json.dump(entry, f)
+        os.replace(tmp, file)
+    except OSError:
+        pass  # the response is still good; it just won't be cached
+    return entry["body"]
+
+
+def cache_clear(group=None):
+    """Invalidate cached responses for this location (optionally one endpoint group)."""
+    if group and group not in CACHE_TTLS:
+        return {"error": "unknown_group", "message": f"Cache groups: {', '.join(CACHE_TTLS)}"}
+    removed = 0
+    try:
+        directory = _cache_dir()
+    except OSError:
+        return {"cleared": 0, "group": group or "all", "locationId": _loc()}
+    for name in os.listdir(directory):
+        if not name.endswith(".json") or name == "stats.json":
+            continue
+        file = os.path.join(directory, name)
+        try:
+            with open(file) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            entry = {}
+        if entry.get("location", _loc()) == _loc() and (group is None or entry.get("group") == group):
+            os.remove(file)
+            removed += 1
+    return {"cleared": removed, "group": group or "all", "locationId": _loc()}
+
+
+def cache_stats():
+    """Cache hit/miss/revalidation totals across runs, plus this process's counts."""
+    try:
+        with _locked_json(os.path.join(_cache_dir(), "stats.json")) as totals:
+            totals = dict(totals)
+    except OSError:
+        totals = {}
+    try:
+        entries = sum(1 for n in os.listdir(_cache_dir()) if n.endswith(".json") and n != "stats.json")
+    except OSError:
+        entries = 0
+    lookups = sum(totals.get(k, 0) for k in _cache_counts)
+    served = totals.get("hits", 0) + totals.get("revalidated", 0)
     return {
-        item_key or "items": all_items,
-        "total": len(all_items),
-        "pages": page,
-        "endpoint": endpoint_base,
+        "enabled": CACHE_ENABLED, "entries": entries, "ttls": CACHE_TTLS,
+        "totals": {k: totals.get(k, 0) for k in _cache_counts},
+        "hit_ratio": round(served / lookups, 3) if lookups else 0.0,
+        "this_process": dict(_cache_counts),
     }
 
 
-def _out(data):
-    print(json.dumps(data, indent=2))
+_STATS_SOURCES["cache"] = lambda: dict(_cache_counts)
+
+
+# ──────────────────────────────────────────────
+# Custom Field Names
+# ──────────────────────────────────────────────
+
+# Annotate customFields entries in printed records with their name and fieldKey
+CUSTOM_FIELD_NAMES = _env_flag("HIGHLEVEL_CUSTOM_FIELD_NAMES")
+
+# Unknown field IDs revalidate the dictionary at most this often (seconds) per location
+FIELD_MISS_REFRESH_INTERVAL = 60
+
+
+class _FieldNames:
+    """Per-location dictionary of custom field ID -> {"name", "fieldKey"}.
+
+    Loaded through the custom_fields response cache when first needed and again
+    once that TTL passes. A record referencing an unknown ID triggers an early
+    revalidation, throttled so deleted fields can't cause a refetch per record.
+    A failed load (e.g. a token without the custom fields scope) is cached, on
+    disk too, and retried only after FIELD_MISS_REFRESH_INTERVAL.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tables = {}  # location -> {"loaded": t, "refreshed": t, "names": {id: {...}}}
+        self.counts = {"loads": 0, "miss_refreshes": 0}
+
+    @staticmethod
+    def _fetch(location, max_age=None):
+        token = _credentials.set((_location_token(location), location))
+        try:
+            data = _cached_get(f"/locations/{location}/customFields", "custom_fields", max_age,
+                               error_ttl=FIELD_MISS_REFRESH_INTERVAL)
+        finally:
+            _credentials.reset(token)
+        fields = data.get("customFields") if isinstance(data, dict) else None
+        if not isinstance(fields, list):
+            return None  # keep serving the last good dictionary
+        return {f["id"]: {k: f[k] for k in ("name", "fieldKey") if f.get(k)}
+                for f in fields if isinstance(f, dict) and f.get("id")}
+
+    def table(self, location):
+        """The dictionary for a location, loading it if absent or past its TTL."""
+        with self._lock:
+            entry = self._tables.get(location)
+            now = time.monotonic()
+            if entry is not None and now - entry["loaded"] <= entry["ttl"]:
+                return entry["names"]
+            self.counts["loads"] += 1
+        # Fetched outside the lock so output threads don't queue behind one HTTP call;
+        # concurrent identical loads share a request through single-flight
+        names = self._fetch(location)
+        with self._lock:
+            previous = self._tables.get(location)
+            # Just loaded, so a miss right away is a deleted field, not a stale dictionary
+            self._tables[location] = {
+                "loaded": now, "refreshed": now,
+                "ttl": CACHE_TTLS["custom_fields"] if names is not None else FIELD_MISS_REFRESH_INTERVAL,
+                "names": names if names is not None else (previous["names"] if previous else {})}
+            return self._tables[location]["names"]
+
+    def refresh(self, location):
+        """Revalidate after a miss unless that happened within FIELD_MISS_REFRESH_INTERVAL."""
+        self.table(location)
+        with self._lock:
+            entry = self._tables[location]
+            now = time.monotonic()
+            if now - entry["refreshed"] < FIELD_MISS_REFRESH_INTERVAL:
+                return entry["names"]
+            entry["refreshed"] = now
+            self.counts["miss_refreshes"] += 1
+        names = self._fetch(location, max_age=0)
+        with self._lock:
+            if names is not None:
+                entry.update(names=names, loaded=now, ttl=CACHE_TTLS["custom_fields"])
+            return entry["names"]
+
+
+_field_names = _FieldNames()
+_STATS_SOURCES["custom_fields"] = lambda: dict(_field_names.counts)
+
+
+def _location_token(location):
+    """Token for a location: its own from HIGHLEVEL_LOCATIONS, else the current one."""
+    if location == _loc():
+        return _token()
+    try:
+        return _load_locations().get(location, _token())
+    except (OSError, ValueError):
+        return _token()
+
+
+def _name_custom_fields(records):
+    """Add "name" and "fieldKey" to every customFields entry of the given records, in place."""
+    tables = {}
+    for record in records:
+        fields = record.get("customFields") if isinstance(record, dict) else None
+        if not fields or not isinstance(fields, list):
+            continue
+        location = record.get("locationId") or _loc()
+        table = tables.get(location)
+        if table is None:
+            table = tables[location] = _field_names.table(location)
+        for field in fields:
+            if not isinstance(field, dict) or "fieldKey" in field or not field.get("id"):
+                continue
+            names = table.get(field["id"])
+            if names is None:
+                table = tables[location] = _field_names.refresh(location)
+                names = table.get(field["id"])
+            if names:
+                field.update(names)
+    return records
+
+
+def _annotate_custom_fields(data):
+    """Name the custom fields of contacts/opportunities in a result, page by page when streaming."""
+    if isinstance(data, dict) and _records(data) is None:
+        _name_custom_fields([v for v in data.values() if isinstance(v, dict)])  # e.g. {"contact": {...}}
+        return data
+    return _map_pages(data, _name_custom_fields)
 
 
 # ──────────────────────────────────────────────
@@ -192,12 +1899,12 @@ def _out(data):
 
 def test_connection():
     """Verify token and location ID are working using contacts endpoint."""
-    if not TOKEN:
+    if not _token():
         return {"error": "HIGHLEVEL_TOKEN not set. Set the environment variable or run /highlevel-setup"}
-    if not LOC_ID:
+    if not _loc():
         return {"error": "HIGHLEVEL_LOCATION_ID not set. Set the environment variable or run /highlevel-setup"}
 
-    result = _get(f"/contacts/?locationId={urllib.parse.quote(LOC_ID, safe='')}&limit=1")
+    result = _get(f"/contacts/?locationId={urllib.parse.quote(_loc(), safe='')}&limit=1")
 
     if "error" in result:
         error_code = result.get("error")
@@ -219,7 +1926,7 @@ def test_connection():
     total = result.get("total", 0)
     return {
         "status": "connected",
-        "locationId": LOC_ID,
+        "locationId": _loc(),
         "totalContacts": total,
         "message": f"Successfully connected! Found {total} contacts.",
     }
@@ -238,7 +1945,7 @@ def search_contacts(query="", limit=20, paginate=True):
         paginate: If True (default), fetch ALL contacts across all pages
     """
     if not paginate:
-        params = urllib.parse.urlencode({"locationId": LOC_ID, "query": query, "limit": limit})
+        params = urllib.parse.urlencode({"locationId": _loc(), "query": query, "limit": limit})
         return _get(f"/contacts/?{params}")
 
     search_params = {"query": query} if query else {}
@@ -260,7 +1967,7 @@ def create_contact(data):
     """Create a new contact. data = JSON with firstName, lastName, email, phone, etc."""
     if isinstance(data, str):
         data = json.loads(data)
-    data["locationId"] = LOC_ID
+    data["locationId"] = _loc()
     return _post("/contacts/", data)
 
 
@@ -282,7 +1989,7 @@ def upsert_contact(data):
     """Create or update contact by email/phone match."""
     if isinstance(data, str):
         data = json.loads(data)
-    data["locationId"] = LOC_ID
+    data["locationId"] = _loc()
     return _post("/contacts/upsert", data)
 
 
@@ -308,7 +2015,7 @@ def remove_contact_tags(contact_id, tags):
 
 def list_conversations(limit=20):
     """List recent conversations."""
-    params = urllib.parse.urlencode({"locationId": LOC_ID, "limit": limit})
+    params = urllib.parse.urlencode({"locationId": _loc(), "limit": limit})
     return _get(f"/conversations/search?{params}")
 
 
@@ -350,8 +2057,8 @@ def send_email(contact_id, subject, html_message, email_from=None):
 
 def list_calendars():
     """List all calendars for this location."""
-    params = urllib.parse.urlencode({"locationId": LOC_ID})
-    return _get(f"/calendars/?{params}")
+    params = urllib.parse.urlencode({"locationId": _loc()})
+    return _cached_get(f"/calendars/?{params}", "calendars")
 
 
 def get_free_slots(calendar_id, start_date, end_date):
@@ -370,7 +2077,7 @@ def create_appointment(calendar_id, data):
     if isinstance(data, str):
         data = json.loads(data)
     data["calendarId"] = cal_id
-    data["locationId"] = LOC_ID
+    data["locationId"] = _loc()
     return _post("/calendars/events", data)
 
 
@@ -387,7 +2094,7 @@ def list_opportunities(pipeline_id=None, limit=20, paginate=True):
         paginate: If True (default), fetch ALL opportunities
     """
     if not paginate:
-        params = {"locationId": LOC_ID, "limit": limit}
+        params = {"locationId": _loc(), "limit": limit}
         if pipeline_id:
             params["pipelineId"] = _validate_id(pipeline_id, "pipeline_id")
         return _get(f"/opportunities/search?{urllib.parse.urlencode(params)}")
@@ -408,13 +2115,13 @@ def create_opportunity(data):
     """Create a new opportunity."""
     if isinstance(data, str):
         data = json.loads(data)
-    data["locationId"] = LOC_ID
+    data["locationId"] = _loc()
     return _post("/opportunities/", data)
 
 
 def list_pipelines():
     """List all pipelines and their stages."""
-    return _get(f"/opportunities/pipelines?locationId={urllib.parse.quote(LOC_ID, safe='')}")
+    return _cached_get(f"/opportunities/pipelines?locationId={urllib.parse.quote(_loc(), safe='')}", "pipelines")
 
 
 # ──────────────────────────────────────────────
@@ -428,7 +2135,7 @@ def list_workflows(paginate=True):
         paginate: If True (default), fetch ALL workflows
     """
     if not paginate:
-        return _get(f"/workflows/?locationId={urllib.parse.quote(LOC_ID, safe='')}")
+        return _get(f"/workflows/?locationId={urllib.parse.quote(_loc(), safe='')}")
     return _get_paginated("/workflows/")
 
 
@@ -453,7 +2160,7 @@ def list_campaigns(paginate=True):
         paginate: If True (default), fetch ALL campaigns
     """
     if not paginate:
-        return _get(f"/campaigns/?locationId={urllib.parse.quote(LOC_ID, safe='')}")
+        return _get(f"/campaigns/?locationId={urllib.parse.quote(_loc(), safe='')}")
     return _get_paginated("/campaigns/")
 
 
@@ -464,7 +2171,7 @@ def list_campaigns(paginate=True):
 def list_invoices(limit=20, paginate=True):
     """List invoices."""
     if not paginate:
-        params = urllib.parse.urlencode({"locationId": LOC_ID, "limit": limit})
+        params = urllib.parse.urlencode({"locationId": _loc(), "limit": limit})
         return _get(f"/invoices/?{params}")
     return _get_paginated("/invoices/")
 
@@ -479,7 +2186,7 @@ def create_invoice(data):
     """Create a new invoice."""
     if isinstance(data, str):
         data = json.loads(data)
-    data["altId"] = LOC_ID
+    data["altId"] = _loc()
     data["altType"] = "location"
     return _post("/invoices/", data)
 
@@ -491,7 +2198,7 @@ def create_invoice(data):
 def list_orders(limit=20, paginate=True):
     """List payment orders."""
     if not paginate:
-        params = urllib.parse.urlencode({"locationId": LOC_ID, "limit": limit})
+        params = urllib.parse.urlencode({"locationId": _loc(), "limit": limit})
         return _get(f"/payments/orders/?{params}")
     return _get_paginated("/payments/orders/")
 
@@ -499,7 +2206,7 @@ def list_orders(limit=20, paginate=True):
 def list_transactions(limit=20, paginate=True):
     """List payment transactions."""
     if not paginate:
-        params = urllib.parse.urlencode({"locationId": LOC_ID, "limit": limit})
+        params = urllib.parse.urlencode({"locationId": _loc(), "limit": limit})
         return _get(f"/payments/transactions/?{params}")
     return _get_paginated("/payments/transactions/")
 
@@ -507,7 +2214,7 @@ def list_transactions(limit=20, paginate=True):
 def list_subscriptions(limit=20, paginate=True):
     """List payment subscriptions."""
     if not paginate:
-        params = urllib.parse.urlencode({"locationId": LOC_ID, "limit": limit})
+        params = urllib.parse.urlencode({"locationId": _loc(), "limit": limit})
         return _get(f"/payments/subscriptions/?{params}")
     return _get_paginated("/payments/subscriptions/")
 
@@ -519,7 +2226,7 @@ def list_subscriptions(limit=20, paginate=True):
 def list_products(limit=20, paginate=True):
     """List products."""
     if not paginate:
-        params = urllib.parse.urlencode({"locationId": LOC_ID, "limit": limit})
+        params = urllib.parse.urlencode({"locationId": _loc(), "limit": limit})
         return _get(f"/products/?{params}")
     return _get_paginated("/products/")
 
@@ -537,7 +2244,7 @@ def get_product(product_id):
 def list_forms(paginate=True):
     """List all forms."""
     if not paginate:
-        return _get(f"/forms/?locationId={urllib.parse.quote(LOC_ID, safe='')}")
+        return _get(f"/forms/?locationId={urllib.parse.quote(_loc(), safe='')}")
     return _get_paginated("/forms/")
 
 
@@ -545,7 +2252,7 @@ def list_form_submissions(form_id, limit=20, paginate=True):
     """Get form submissions."""
     fid = _validate_id(form_id, "form_id")
     if not paginate:
-        params = urllib.parse.urlencode({"locationId": LOC_ID, "limit": limit, "formId": fid})
+        params = urllib.parse.urlencode({"locationId": _loc(), "limit": limit, "formId": fid})
         return _get(f"/forms/submissions?{params}")
     return _get_paginated("/forms/submissions", {"formId": fid})
 
@@ -553,14 +2260,14 @@ def list_form_submissions(form_id, limit=20, paginate=True):
 def list_surveys(paginate=True):
     """List all surveys."""
     if not paginate:
-        return _get(f"/surveys/?locationId={urllib.parse.quote(LOC_ID, safe='')}")
+        return _get(f"/surveys/?locationId={urllib.parse.quote(_loc(), safe='')}")
     return _get_paginated("/surveys/")
 
 
 def list_funnels(paginate=True):
     """List all funnels."""
     if not paginate:
-        return _get(f"/funnels/funnel/list?locationId={urllib.parse.quote(LOC_ID, safe='')}")
+        return _get(f"/funnels/funnel/list?locationId={urllib.parse.quote(_loc(), safe='')}")
     return _get_paginated("/funnels/funnel/list")
 
 
@@ -570,15 +2277,15 @@ def list_funnels(paginate=True):
 
 def list_social_posts(limit=20):
     """List social media posts."""
-    loc = _validate_id(LOC_ID, "location_id")
+    loc = _validate_id(_loc(), "location_id")
     return _post(f"/social-media-posting/{loc}/posts/list", {
         "limit": limit, "skip": 0,
-    })
+    }, idempotent=True)
 
 
 def create_social_post(data):
     """Create a social media post."""
-    loc = _validate_id(LOC_ID, "location_id")
+    loc = _validate_id(_loc(), "location_id")
     if isinstance(data, str):
         data = json.loads(data)
     return _post(f"/social-media-posting/{loc}/posts", data)
@@ -590,17 +2297,17 @@ def create_social_post(data):
 
 def list_media():
     """List media files."""
-    return _get(f"/medias/files?locationId={urllib.parse.quote(LOC_ID, safe='')}")
+    return _get(f"/medias/files?locationId={urllib.parse.quote(_loc(), safe='')}")
 
 
 def list_users():
     """List users for this location."""
-    return _get(f"/users/?locationId={urllib.parse.quote(LOC_ID, safe='')}")
+    return _cached_get(f"/users/?locationId={urllib.parse.quote(_loc(), safe='')}", "users")
 
 
 def list_trigger_links():
     """List trigger links."""
-    return _get(f"/links/?locationId={urllib.parse.quote(LOC_ID, safe='')}")
+    return _get(f"/links/?locationId={urllib.parse.quote(_loc(), safe='')}")
 
 
 # ──────────────────────────────────────────────
@@ -609,31 +2316,31 @@ def list_trigger_links():
 
 def get_location_details():
     """Get current location details."""
-    loc = _validate_id(LOC_ID, "location_id")
-    return _get(f"/locations/{loc}")
+    loc = _validate_id(_loc(), "location_id")
+    return _cached_get(f"/locations/{loc}", "location")
 
 
 def list_location_custom_fields():
     """List custom fields for this location."""
-    loc = _validate_id(LOC_ID, "location_id")
-    return _get(f"/locations/{loc}/customFields")
+    loc = _validate_id(_loc(), "location_id")
+    return _cached_get(f"/locations/{loc}/customFields", "custom_fields")
 
 
 def list_location_tags():
     """List tags for this location."""
-    loc = _validate_id(LOC_ID, "location_id")
-    return _get(f"/locations/{loc}/tags")
+    loc = _validate_id(_loc(), "location_id")
+    return _cached_get(f"/locations/{loc}/tags", "tags")
 
 
 def list_location_custom_values():
     """List custom values for this location."""
-    loc = _validate_id(LOC_ID, "location_id")
+    loc = _validate_id(_loc(), "location_id")
     return _get(f"/locations/{loc}/customValues")
 
 
 def list_courses():
     """List courses/memberships."""
-    return _get(f"/courses/?locationId={urllib.parse.quote(LOC_ID, safe='')}")
+    return _get(f"/courses/?locationId={urllib.parse.quote(_loc(), safe='')}")
 
 
 def list_snapshots():
@@ -647,75 +2354,1886 @@ def get_snapshot_status(snapshot_id):
     return _get(f"/snapshots/{sid}/status")
 
 
+# ──────────────────────────────────────────────
+# Resumable Export
+# ──────────────────────────────────────────────
+
+def _save_checkpoint(path, state):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def export(command, out_path, *args):
+    """Export every record of a list command to an NDJSON file, with no page cap.
+
+    The cursor is checkpointed to <out_path>.checkpoint after each page has been
+    written and fsynced. Re-running the same export after an interruption
+    truncates the file back to the last good page and resumes from its cursor;
+    if the file has since been deleted or cut shorter, it starts over.
+    """
+    func = COMMANDS.get(command)
+    if func is None:
+        return {"error": "unknown_command", "message": f"Unknown command: {command}"}
+    checkpoint_path = f"{out_path}.checkpoint"
+    checkpoint = {}
+    if os.path.exists(checkpoint_path):
+        with open(checkpoint_path) as f:
+            checkpoint = json.load(f)
+        if checkpoint.get("complete") or checkpoint.get("command") != command or checkpoint.get("args") != list(args):
+            checkpoint = {}
+        elif not os.path.exists(out_path) or os.path.getsize(out_path) < checkpoint.get("bytes", 0):
+            # Resuming would pad the gap with NULs or leave records missing
+            print(f"{out_path} is missing or shorter than its checkpoint; starting the export over.", file=sys.stderr)
+            checkpoint = {}
+
+    token = _paging.set({"max_pages": None, "start": checkpoint.get("cursor")})
+    try:
+        paged = func(list(args))
+    finally:
+        _paging.reset(token)
+    if not isinstance(paged, _Paged):
+        return {"error": "not_paginated", "message": f"'{command}' is not a paginated list command."}
+    if checkpoint and (checkpoint.get("endpoint"), checkpoint.get("params")) != (paged.endpoint, paged.params):
+        return {"error": "checkpoint_mismatch", "message": f"{checkpoint_path} belongs to a different query; delete it to start over."}
+
+    state = {
+        "command": command, "args": list(args), "endpoint": paged.endpoint, "params": paged.params,
+        "cursor": None, "pages": checkpoint.get("pages", 0), "records": checkpoint.get("records", 0),
+        "bytes": checkpoint.get("bytes", 0), "complete": False,
+    }
+    resumed_from = state["pages"] if checkpoint else None
+    with open(out_path, "ab" if checkpoint else "wb") as out:
+        out.truncate(state["bytes"])
+        out.seek(state["bytes"])
+        for page in paged.iter_pages():
+            out.write(b"".join(_json_compact(item).encode() + b"\n" for item in page))
+            out.flush()
+            os.fsync(out.fileno())
+            state.update(cursor=paged.cursor, pages=state["pages"] + 1, records=state["records"] + len(page),
+                         bytes=out.tell(), complete=paged.complete, updated=time.time())
+            _save_checkpoint(checkpoint_path, state)
+
+    result = {
+        "status": "complete" if paged.complete else "incomplete",
+        "output": out_path,
+        "records": state["records"],
+        "pages": state["pages"],
+        "checkpoint": checkpoint_path,
+    }
+    if resumed_from is not None:
+        result["resumed_from_page"] = resumed_from
+    if not paged.complete:
+        result["error"] = paged.error
+        result["message"] = "Export was cut short; run the same command again to resume from the checkpoint."
+    return result
+
+
+# ──────────────────────────────────────────────
+# Bulk Writes
+# ──────────────────────────────────────────────
+
+def _split_tags(value):
+    if isinstance(value, str):
+        return [t.strip() for t in re.split(r"[,;|]", value) if t.strip()]
+    return list(value or [])
+
+
+def _bulk_update_contact(record):
+    record = dict(record)
+    return update_contact(record.pop("id", None), record)
+
+
+# Each operation takes one record; all are safe to repeat, which is what makes resume safe
+_BULK_OPERATIONS = {
+    "upsert_contact": lambda r: upsert_contact(dict(r)),
+    "update_contact": _bulk_update_contact,
+    "add_contact_tags": lambda r: add_contact_tags(r.get("id"), _split_tags(r.get("tags"))),
+}
+
+
+def _read_records(path, expect=dict):
+    """Yield (line_number, record) from a CSV (header row) or NDJSON file without loading it.
+    An NDJSON line that isn't an `expect` instance raises ValueError."""
+    with open(path, newline="") as f:
+        if path.lower().endswith(".csv"):
+            reader = csv.DictReader(f)
+            for row in reader:
+                record = {k: v for k, v in row.items() if k and v not in (None, "")}
+                if "tags" in record:
+                    record["tags"] = _split_tags(record["tags"])
+                yield reader.line_num, record
+        else:
+            for line_no, line in enumerate(f, 1):
+                if line.strip():
+                    record = json.loads(line)
+                    if not isinstance(record, expect):
+                        raise ValueError(f"{path}:{line_no}: expected a JSON object, got {type(record).__name__}")
+                    yield line_no, record
+
+
+def bulk_write(operation, path, *options):
+    """Stream records from a CSV/NDJSON file through a worker pool for one write operation.
+
+    Options: --workers N (default HIGHLEVEL_CONCURRENCY), --log PATH (default
+    <path>.<operation>.log). Every record's outcome is appended to the log as
+    NDJSON; re-running skips records the log already shows as succeeded.
+    """
+    op = _BULK_OPERATIONS.get(operation)
+    if op is None:
+        return {"error": "unknown_operation", "message": f"Bulk operations: {', '.join(_BULK_OPERATIONS)}"}
+    if not os.path.isfile(path):
+        return {"error": "bad_input", "message": f"No such file: {path}"}
+    opts = dict(zip(options[::2], options[1::2]))
+    workers = max(1, int(opts.get("--workers") or ASYNC_CONCURRENCY))
+    log_path = opts.get("--log") or f"{path}.{operation}.log"
+
+    done = set()
+    if os.path.exists(log_path):
+        with open(log_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # torn final line from a crash
+                if entry.get("status") == "ok":
+                    done.add(entry["key"])
+
+    def run(record):
+        started = time.monotonic()
+        try:
+            result = op(record)
+        except ValueError as e:
+            result = {"error": "validation_failed", "message": str(e)}
+        except Exception as e:
+            result = {"error": "unexpected", "message": str(e)}  # logged as failed, not fatal to the run
+        return result, round((time.monotonic() - started) * 1000, 1)
+
+    counts = {"succeeded": 0, "failed": 0, "skipped": 0}
+    started = time.time()
+    with open(log_path, "a", encoding="utf-8") as log, ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ghl-bulk") as pool:
+        pending = {}
+
+        def drain():
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                line_no, key = pending.pop(future)
+                result, ms = future.result()
+                entry = {"line": line_no, "key": key, "ms": ms}
+                if isinstance(result, dict) and "error" in result:
+                    entry.update(status="error", error=result)
+                    counts["failed"] += 1
+                else:
+                    record = (result or {}).get("contact") or result or {}
+                    entry.update(status="ok", id=record.get("id") if isinstance(record, dict) else None)
+                    counts["succeeded"] += 1
+                log.write(_json_compact(entry) + "\n")
+            log.flush()
+
+        try:
+            for line_no, record in _read_records(path):
+                key = hashlib.sha1(f"{operation}:{line_no}:{json.dumps(record, sort_keys=True)}".encode()).hexdigest()[:16]
+                if key in done:
+                    counts["skipped"] += 1
+                    continue
+                pending[pool.submit(contextvars.copy_context().run, run, record)] = (line_no, key)
+                if len(pending) >= workers * 2:
+                    drain()
+        except (OSError, ValueError, csv.Error) as e:
+            while pending:
+                drain()
+            return {"error": "bad_input", "message": str(e), "log": log_path, **counts}
+        while pending:
+            drain()
+
+    elapsed = time.time() - started
+    processed = counts["succeeded"] + counts["failed"]
+    return {
+        "operation": operation, "file": path, "log": log_path, **counts,
+        "elapsed_s": round(elapsed, 2), "rate_per_s": round(processed / elapsed, 1) if elapsed else None,
+    }
+
+
+# ──────────────────────────────────────────────
+# Bulk Reads
+# ──────────────────────────────────────────────
+
+# Record kinds bulk_get hydrates: kind -> (fetch function, response key, output list key)
+_BULK_GET_KINDS = {
+    "contact": (get_contact, "contact", "contacts"),
+    "opportunity": (get_opportunity, "opportunity", "opportunities"),
+    "invoice": (get_invoice, "invoice", "invoices"),
+}
+_BULK_GET_ALIASES = {"contacts": "contact", "opportunities": "opportunity", "invoices": "invoice"}
+
+
+class _BulkGetPaged(_Paged):
+    """bulk_get results: one record per distinct ID, in input order, fetched by a
+    worker pool that runs at most 2x workers ahead of the consumer."""
+
+    def __init__(self, kind, ids, invalid, workers, requested):
+        super().__init__(kind)
+        self._fetch, self._key, self.item_key = _BULK_GET_KINDS[kind]
+        self.ids, self.invalid, self.workers = ids, invalid, workers
+        self.requested, self.failed = requested, 0
+
+    def _one(self, record_id):
+        """Fetch one ID; returns (failed, record or error entry)."""
+        if record_id in self.invalid:
+            return True, {"id": record_id, "error": "validation_failed", "message": self.invalid[record_id]}
+        try:
+            result = self._fetch(record_id)
+        except Exception as e:
+            return True, {"id": record_id, "error": "unexpected", "message": str(e)}
+        if isinstance(result, dict) and "error" in result:
+            return True, {"id": record_id, **result}
+        return False, result.get(self._key, result) if isinstance(result, dict) else result
+
+    def iter_pages(self):
+        context = contextvars.copy_context()
+        context.run(_priority.set, self.priority)
+        context.run(_deadline.set, self.deadline)
+        pending, window = iter(self.ids), []
+        pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ghl-get")
+        try:
+            for record_id in itertools.islice(pending, 2 * self.workers):
+                window.append(pool.submit(context.copy().run, self._one, record_id))
+            while window:
+                # Hand over every finished result at the head of the window, blocking only for the first
+                done = [window.pop(0).result()]
+                while window and window[0].done():
+                    done.append(window.pop(0).result())
+                for record_id in itertools.islice(pending, len(done)):
+                    window.append(pool.submit(context.copy().run, self._one, record_id))
+                self.pages += 1
+                self.total += len(done)
+                self.failed += sum(failed for failed, _ in done)
+                yield [record for _, record in done]
+            self.complete = True
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def summary(self):
+        return {"total": self.total, "requested": self.requested, "duplicates": self.requested - len(self.ids),
+                "failed": self.failed, "kind": self.endpoint, "complete": self.complete}
+
+
+def _read_ids(source):
+    """IDs from a file ("-" for stdin): comma/space separated, or NDJSON objects with an "id"."""
+    f = sys.stdin if source == "-" else open(source)
+    try:
+        for line in f:
+            line = line.strip()
+            if line.startswith("{"):
+                record_id = json.loads(line).get("id")
+                if record_id:
+                    yield str(record_id)
+            else:
+                yield from (part for part in re.split(r"[\s,]+", line) if part)
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def bulk_get(kind, *args):
+    """Fetch many contacts, opportunities or invoices by ID concurrently.
+
+    IDs are given as arguments and/or read from --file PATH ("-" for stdin).
+    Each is checked with _validate_id; duplicates are fetched once. Results come
+    back in input order, one per distinct ID, with {"id", "error", "message"} in
+    place of any record that could not be fetched.
+    Options: --workers N (default HIGHLEVEL_CONCURRENCY).
+    """
+    kind = _BULK_GET_ALIASES.get(kind, kind)
+    if kind not in _BULK_GET_KINDS:
+        return {"error": "unknown_kind", "message": f"bulk_get kinds: {', '.join(_BULK_GET_KINDS)}"}
+    args, ids, workers = list(args), [], ASYNC_CONCURRENCY
+    while args:
+        arg = args.pop(0)
+        if arg == "--workers":
+            workers = max(1, int(args.pop(0)))
+        elif arg == "--file":
+            source = args.pop(0)
+            try:
+                ids.extend(_read_ids(source))
+            except (OSError, ValueError) as e:
+                return {"error": "bad_input", "message": str(e)}
+        else:
+            ids.append(arg)
+    if not ids:
+        return {"error": "missing_argument", "message": "bulk_get needs IDs as arguments or via --file."}
+
+    distinct, invalid = list(dict.fromkeys(ids)), {}
+    for record_id in distinct:
+        try:
+            _validate_id(record_id, f"{kind}_id")
+        except ValueError as e:
+            invalid[record_id] = str(e)
+    paged = _BulkGetPaged(kind, distinct, invalid, workers, len(ids))
+    return paged if _streaming.get() else paged.to_dict()
+
+
+# ──────────────────────────────────────────────
+# Outbox (durable write-ahead queue for mutations)
+# ──────────────────────────────────────────────
+
+# Journal send_message, send_email, create_contact and add_to_workflow before sending them
+OUTBOX_ENABLED = _env_flag("HIGHLEVEL_OUTBOX")
+# Seconds a sent action keeps answering repeats of its idempotency key instead of sending again
+OUTBOX_DEDUPE_WINDOW_S = _env_float("HIGHLEVEL_OUTBOX_DEDUPE_WINDOW", 86400.0)
+# Deliveries attempted per entry before it is marked failed
+OUTBOX_MAX_ATTEMPTS = _env_int("HIGHLEVEL_OUTBOX_MAX_ATTEMPTS", 5)
+# A "sending" entry whose owner can't be checked (another host) is presumed dead after this long
+OUTBOX_LEASE_S = 600
+
+_OUTBOX_COMMANDS = ("send_message", "send_email", "create_contact", "add_to_workflow")
+# Errors that stop a delivery before its request goes out: safe to deliver again later, unless
+# they came after an earlier attempt that reached GHL (the error then carries request_sent)
+_OUTBOX_NOT_SENT = {"circuit_open", "daily_limit_reached", "deadline_exceeded"}
+
+OUTBOX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, key TEXT NOT NULL, command TEXT NOT NULL, args TEXT NOT NULL,
+    state TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, owner TEXT,
+    created_at REAL NOT NULL, updated_at REAL NOT NULL, next_attempt_at REAL NOT NULL DEFAULT 0,
+    result TEXT, error TEXT);
+CREATE INDEX IF NOT EXISTS outbox_key ON outbox (key, id);
+CREATE INDEX IF NOT EXISTS outbox_due ON outbox (state, next_attempt_at, id);
+"""
+
+_outbox_counts = {"journaled": 0, "duplicates": 0, "sent": 0, "requeued": 0, "failed": 0, "uncertain": 0}
+_outbox_lock = threading.Lock()
+_STATS_SOURCES["outbox"] = lambda: dict(_outbox_counts)
+
+
+def _outbox_count(name):
+    with _outbox_lock:
+        _outbox_counts[name] += 1
+
+
+def _outbox_path():
+    return _state_path(f"outbox-{_loc() or 'default'}.sqlite3")
+
+
+def _outbox_db():
+    """Open the location's outbox (WAL with full sync, so a journaled action survives a crash)."""
+    db = sqlite3.connect(_outbox_path(), timeout=30, isolation_level=None)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=FULL")
+    db.executescript(OUTBOX_SCHEMA)
+    db.row_factory = sqlite3.Row
+    return db
+
+
+@contextlib.contextmanager
+def _immediate(db):
+    """A write transaction that takes the database lock up front, so check-then-write is atomic."""
+    db.execute("BEGIN IMMEDIATE")
+    try:
+        yield db
+    except BaseException:
+        db.execute("ROLLBACK")
+        raise
+    db.execute("COMMIT")
+
+
+_OWNER = f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _owner_alive(owner, updated_at):
+    host, _, pid = (owner or "").rpartition(":")
+    if host != socket.gethostname() or not pid.isdigit():
+        return time.time() - updated_at < OUTBOX_LEASE_S
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _outbox_recover(db):
+    """Mark entries whose sending process died as uncertain: GHL may or may not have acted on them."""
+    with _immediate(db):
+        for row in db.execute("SELECT id, owner, updated_at FROM outbox WHERE state = 'sending'").fetchall():
+            if not _owner_alive(row["owner"], row["updated_at"]):
+                db.execute("UPDATE outbox SET state = 'uncertain', updated_at = ?, error = ? WHERE id = ?",
+                           (time.time(), _json_compact({"error": "interrupted", "message": "The sending process exited mid-request."}), row["id"]))
+
+
+def _outbox_key(command, args):
+    """Default idempotency key: the location, command and arguments."""
+    return hashlib.sha256(_json_compact([_loc(), command, list(args)]).encode()).hexdigest()[:32]
+
+
+def _outbox_entry(row):
+    entry = {"id": row["id"], "key": row["key"], "command": row["command"], "state": row["state"],
+             "attempts": row["attempts"], "created_at": row["created_at"], "updated_at": row["updated_at"]}
+    if row["state"] == "queued" and row["next_attempt_at"] > time.time():
+        entry["next_attempt_in_s"] = round(row["next_attempt_at"] - time.time(), 1)
+    if row["error"]:
+        entry["error"] = json.loads(row["error"])
+    return entry
+
+
+def _outbox_journal(db, command, args, key, dedupe_sent=True):
+    """Journal one action as queued. Returns (row, fresh); fresh is False when the key is already
+    queued, in flight, uncertain, or (with dedupe_sent) was sent within the dedupe window, so
+    nothing new is queued."""
+    now = time.time()
+    with _immediate(db):
+        row = db.execute("SELECT * FROM outbox WHERE key = ? ORDER BY id DESC LIMIT 1", (key,)).fetchone()
+        if row and (row["state"] in ("queued", "sending", "uncertain")
+                    or dedupe_sent and row["state"] == "sent" and now - row["updated_at"] < OUTBOX_DEDUPE_WINDOW_S):
+            return row, False
+        cur = db.execute("INSERT INTO outbox (key, command, args, state, created_at, updated_at) VALUES (?, ?, ?, 'queued', ?, ?)",
+                         (key, command, _json_compact(list(args)), now, now))
+        row = db.execute("SELECT * FROM outbox WHERE id = ?", (cur.lastrowid,)).fetchone()
+    _outbox_count("journaled")
+    return row, True
+
+
+def _outbox_claim(db, entry_id=None):
+    """Move one due queued entry (or the given one) to sending under this process. Returns it or None."""
+    now = time.time()
+    with _immediate(db):
+        if entry_id is None:
+            row = db.execute("SELECT id FROM outbox WHERE state = 'queued' AND next_attempt_at <= ? ORDER BY id LIMIT 1", (now,)).fetchone()
+            entry_id = row["id"] if row else None
+        if entry_id is None or not db.execute(
+                "UPDATE outbox SET state = 'sending', owner = ?, attempts = attempts + 1, updated_at = ? WHERE id = ? AND state = 'queued'",
+                (_OWNER, now, entry_id)).rowcount:
+            return None
+        return db.execute("SELECT * FROM outbox WHERE id = ?", (entry_id,)).fetchone()
+
+
+def _outbox_deliver(db, row):
+    """Run a claimed entry's command and record the outcome. Returns (new state, command result)."""
+    try:
+        result = COMMANDS[row["command"]](json.loads(row["args"]))
+    except ValueError as e:
+        result = {"error": "validation_failed", "message": str(e)}
+    except IndexError:
+        result = {"error": "missing_argument", "message": f"Command '{row['command']}' requires additional arguments."}
+    except Exception as e:
+        result = {"error": "unexpected", "message": str(e)}
+
+    now, code = time.time(), result.get("error") if isinstance(result, dict) else None
+    if code is None:
+        state, fields = "sent", {"result": _json_compact(result), "error": None}
+    elif code in ("connection_failed", "unexpected") or result.get("request_sent") or isinstance(code, int) and code >= 500:
+        # The request reached GHL, or may have, before the failure; re-sending could duplicate it
+        state, fields = "uncertain", {"error": _json_compact(result)}
+    elif code in _OUTBOX_NOT_SENT or code == 429 or code == "max_retries_exceeded":
+        if row["attempts"] >= OUTBOX_MAX_ATTEMPTS and code not in _OUTBOX_NOT_SENT:
+            state, fields = "failed", {"error": _json_compact(result)}
+        else:
+            wait = result.get("retry_after") or min(RETRY_CAP_S * 15, random.uniform(1, 5 * 2 ** row["attempts"]))
+            state, fields = "queued", {"error": _json_compact(result), "next_attempt_at": now + wait}
+            if code in _OUTBOX_NOT_SENT:
+                fields["attempts"] = row["attempts"] - 1  # nothing reached GHL; don't count it
+    else:
+        state, fields = "failed", {"error": _json_compact(result)}
+
+    assignments = ", ".join(f"{name} = ?" for name in fields)
+    db.execute(f"UPDATE outbox SET state = ?, owner = NULL, updated_at = ?, {assignments} WHERE id = ?",
+               (state, now, *fields.values(), row["id"]))
+    _outbox_count("requeued" if state == "queued" else state)
+    return state, result
+
+
+def _pop_key(args):
+    """Remove --key KEY from an argument list, returning KEY or None."""
+    if "--key" in args[:-1]:
+        i = args.index("--key")
+        key = args[i + 1]
+        del args[i:i + 2]
+        return key
+    return None
+
+
+def _outbox_send(command, args):
+    """Journal a mutation, then deliver it now.
+
+    A repeat under the same idempotency key (--key KEY, default derived from the
+    arguments) delivers a still-queued entry at once, and otherwise reports the
+    journaled one instead of sending again. Only an explicit --key also matches
+    an entry already sent, returning its original result, so repeating a command
+    on purpose sends it again. If the outbox can't be opened the action is sent
+    unjournaled.
+    """
+    args, db = list(args), None
+    explicit = _pop_key(args)
+    key = explicit or _outbox_key(command, args)
+    try:
+        db = _outbox_db()
+        _outbox_recover(db)
+        row, _ = _outbox_journal(db, command, args, key, dedupe_sent=explicit is not None)
+    except (sqlite3.Error, OSError) as e:
+        if db:
+            db.close()
+        print(f"Outbox unavailable ({e}); sending {command} without journaling.", file=sys.stderr)
+        return COMMANDS[command](args)
+    try:
+        claimed = _outbox_claim(db, row["id"]) if row["state"] == "queued" else None
+        if claimed is not None:
+            _, result = _outbox_deliver(db, claimed)
+            if isinstance(result, dict) and "error" in result:
+                row = db.execute("SELECT * FROM outbox WHERE id = ?", (row["id"],)).fetchone()
+                result = {**result, "outbox": _outbox_entry(row)}
+            return result
+        # Already sent, in flight (e.g. claimed by a drain) or uncertain: report it rather than send twice
+        _outbox_count("duplicates")
+        outbox = {**_outbox_entry(row), "duplicate": True}
+        original = json.loads(row["result"]) if row["state"] == "sent" and row["result"] else None
+        if isinstance(original, dict):
+            return {**original, "outbox": outbox}  # same shape as the first send, so references still resolve
+        return {"status": "duplicate", "outbox": outbox}
+    finally:
+        db.close()
+
+
+def outbox_enqueue(command, *args):
+    """Journal a mutation for outbox_drain to deliver, without sending it now.
+
+    Arguments are the command's own, plus optional --key KEY. With --file PATH,
+    each NDJSON line is one action: a JSON array of arguments, or an object with
+    "args" and an optional "key". Actions whose key is already pending or was
+    recently sent are counted as duplicates and not queued again.
+    """
+    if command not in _OUTBOX_COMMANDS:
+        return {"error": "unknown_command", "message": f"Outbox commands: {', '.join(_OUTBOX_COMMANDS)}"}
+    args = list(args)
+    actions = []
+    if "--file" in args[:-1]:
+        path = args[args.index("--file") + 1]
+        try:
+            for line_no, record in _read_records(path, expect=(dict, list)):
+                if isinstance(record, dict) and isinstance(record.get("args"), list):
+                    actions.append((record["args"], record.get("key")))
+                elif isinstance(record, list):
+                    actions.append((record, None))
+                else:
+                    return {"error": "bad_input", "message": f"{path}:{line_no}: expected an array of arguments or an object with \"args\""}
+        except (OSError, ValueError) as e:
+            return {"error": "bad_input", "message": str(e)}
+    else:
+        key = _pop_key(args)
+        actions.append((args, key))
+
+    counts = {"queued": 0, "duplicates": 0}
+    db = _outbox_db()
+    try:
+        for action_args, key in actions:
+            # Arguments are CLI strings; JSON values in a file (e.g. create_contact data) are passed as JSON text
+            action_args = [a if isinstance(a, str) else _json_compact(a) for a in action_args]
+            row, fresh = _outbox_journal(db, command, action_args, key or _outbox_key(command, action_args))
+            counts["queued" if fresh else "duplicates"] += 1
+        depth = db.execute("SELECT COUNT(*) FROM outbox WHERE state = 'queued'").fetchone()[0]
+    finally:
+        db.close()
+    if len(actions) == 1:
+        return {**_outbox_entry(row), "duplicate": not fresh, "depth": depth}
+    return {"command": command, **counts, "depth": depth}
+
+
+def outbox_drain(*options):
+    """Deliver queued outbox entries through a worker pool at the rate the shared limiter allows.
+
+    Options: --workers N (default HIGHLEVEL_CONCURRENCY), --limit N (stop after N
+    deliveries), --follow (keep waiting for new and retried entries instead of
+    exiting once nothing is due). Entries left mid-send by a crashed process are
+    marked uncertain, never re-sent; see outbox_retry.
+    """
+    opts, follow = [o for o in options if o != "--follow"], "--follow" in options
+    opts = dict(zip(opts[::2], opts[1::2]))
+    workers = max(1, int(opts.get("--workers") or ASYNC_CONCURRENCY))
+    # Each delivery takes a slot first, so --limit holds however many workers race for the last ones
+    slots = threading.Semaphore(int(opts["--limit"])) if opts.get("--limit") else None
+    counts = {"sent": 0, "requeued": 0, "failed": 0, "uncertain": 0}
+    lock = threading.Lock()
+
+    db = _outbox_db()
+    try:
+        _outbox_recover(db)
+        with _immediate(db):
+            db.execute("DELETE FROM outbox WHERE state = 'sent' AND updated_at < ?", (time.time() - OUTBOX_DEDUPE_WINDOW_S,))
+    finally:
+        db.close()
+
+    def work():
+        conn = _outbox_db()
+        try:
+            while True:
+                if slots and not slots.acquire(blocking=False):
+                    return
+                row = _outbox_claim(conn)
+                if row is None:
+                    if slots:
+                        slots.release()
+                    if not follow:
+                        return
+                    time.sleep(1.0)
+                    continue
+                state, _ = _outbox_deliver(conn, row)
+                with lock:
+                    counts["requeued" if state == "queued" else state] += 1
+        finally:
+            conn.close()
+
+    started = time.time()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ghl-outbox") as pool:
+        for future in [pool.submit(contextvars.copy_context().run, work) for _ in range(workers)]:
+            future.result()
+    elapsed = time.time() - started
+    return {"outbox": _outbox_path(), **counts, "elapsed_s": round(elapsed, 2),
+            "rate_per_s": round(counts["sent"] / elapsed, 1) if elapsed else None, "depth": outbox_status()["depth"]}
+
+
+def outbox_status(*options):
+    """Queue depth by state, age of the oldest queued entry, and delivery throughput.
+    --list STATE also returns that state's entries (e.g. uncertain or failed)."""
+    opts = dict(zip(options[::2], options[1::2]))
+    db = _outbox_db()
+    try:
+        _outbox_recover(db)
+        now = time.time()
+        depth = {state: 0 for state in ("queued", "sending", "sent", "failed", "uncertain")}
+        depth.update(db.execute("SELECT state, COUNT(*) FROM outbox GROUP BY state").fetchall())
+        due, oldest = db.execute("SELECT SUM(next_attempt_at <= ?), MIN(created_at) FROM outbox WHERE state = 'queued'", (now,)).fetchone()
+        sent = {f"last_{label}": db.execute("SELECT COUNT(*) FROM outbox WHERE state = 'sent' AND updated_at >= ?", (now - seconds,)).fetchone()[0]
+                for label, seconds in (("minute", 60), ("hour", 3600))}
+        # Delivery rate over the last minute's sends, measured from the first of them
+        recent, first = db.execute("SELECT COUNT(*), MIN(updated_at) FROM outbox WHERE state = 'sent' AND updated_at >= ?", (now - 60,)).fetchone()
+        report = {
+            "outbox": _outbox_path(), "enabled": OUTBOX_ENABLED, "depth": depth, "due": due or 0,
+            "oldest_queued_s": round(now - oldest, 1) if oldest else None,
+            "sent": sent, "recent_rate_per_s": round(recent / max(now - first, 1.0), 2) if recent else 0.0,
+            "this_process": dict(_outbox_counts),
+        }
+        if opts.get("--list"):
+            rows = db.execute("SELECT * FROM outbox WHERE state = ? ORDER BY id LIMIT 1000", (opts["--list"],)).fetchall()
+            report["entries"] = [{**_outbox_entry(r), "args": json.loads(r["args"])} for r in rows]
+        return report
+    finally:
+        db.close()
+
+
+def outbox_retry(*selectors):
+    """Queue failed or uncertain entries again: by ID, by key, or all with --failed / --uncertain.
+
+    Check in GHL first that an uncertain action really did not happen.
+    """
+    if not selectors:
+        return {"error": "missing_argument", "message": "outbox_retry needs entry IDs, keys, --failed or --uncertain."}
+    states = [s.lstrip("-") for s in selectors if s in ("--failed", "--uncertain")]
+    ids = [s for s in selectors if not s.startswith("--")]
+    db = _outbox_db()
+    try:
+        with _immediate(db):
+            params = [*states, *ids, *ids]
+            where = " OR ".join(filter(None, [
+                f"state IN ({', '.join('?' * len(states))})" if states else "",
+                f"(state IN ('failed', 'uncertain') AND (CAST(id AS TEXT) IN ({', '.join('?' * len(ids))}) OR key IN ({', '.join('?' * len(ids))})))" if ids else "",
+            ]))
+            requeued = db.execute(f"UPDATE outbox SET state = 'queued', attempts = 0, next_attempt_at = 0, updated_at = ? WHERE {where}",
+                                  (time.time(), *params)).rowcount
+    finally:
+        db.close()
+    return {"requeued": requeued}
+
+
+# ──────────────────────────────────────────────
+# Local Mirror (SQLite)
+# ──────────────────────────────────────────────
+
+MIRROR_SCHEMA = """
+CREATE TABLE IF NOT EXISTS contacts (id TEXT PRIMARY KEY, updated TEXT, search TEXT, data TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS opportunities (id TEXT PRIMARY KEY, pipeline_id TEXT, updated TEXT, data TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS opportunities_pipeline ON opportunities (pipeline_id);
+CREATE TABLE IF NOT EXISTS pipelines (id TEXT PRIMARY KEY, data TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS sync_state (entity TEXT PRIMARY KEY, cursor TEXT, synced_at REAL, full_sync_at REAL);
+"""
+
+# Contact lookup indexes, maintained alongside the contacts table on every sync
+CONTACT_INDEXES = ("contact_emails", "contact_phones", "contact_terms", "contact_trigrams", "contact_tags")
+CONTACT_INDEX_SCHEMA = "".join(
+    f"CREATE TABLE IF NOT EXISTS {table} (key TEXT NOT NULL, id TEXT NOT NULL, PRIMARY KEY (key, id)) WITHOUT ROWID;"
+    f"CREATE INDEX IF NOT EXISTS {table}_id ON {table} (id);"
+    for table in CONTACT_INDEXES
+)
+CONTACT_INDEX_VERSION = 1
+DEFAULT_COUNTRY_CODE = os.environ.get("HIGHLEVEL_DEFAULT_COUNTRY_CODE", "1").strip().lstrip("+") or "1"
+
+
+def _mirror_path():
+    return _state_path(f"mirror-{_loc() or 'default'}.sqlite3")
+
+
+# Mirror files whose schema and index version this process has already checked
+_mirror_checked = set()
+
+
+def _mirror_db():
+    """Open the location's mirror database (WAL, so reads never wait on a running sync)."""
+    path = _mirror_path()
+    db = sqlite3.connect(path, timeout=30)
+    if path in _mirror_checked:
+        return db
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    db.executescript(MIRROR_SCHEMA + CONTACT_INDEX_SCHEMA)
+    if db.execute("PRAGMA user_version").fetchone()[0] < CONTACT_INDEX_VERSION:
+        # Mirror predates the lookup indexes (or they changed shape): rebuild from stored contacts
+        with db:
+            for table in CONTACT_INDEXES:
+                db.execute(f"DELETE FROM {table}")
+            last = ""
+            while True:
+                batch = db.execute("SELECT id, data FROM contacts WHERE id > ? ORDER BY id LIMIT 1000", (last,)).fetchall()
+                if not batch:
+                    break
+                _store_contacts(db, [json.loads(r[1]) for r in batch])
+                last = batch[-1][0]
+            db.execute(f"PRAGMA user_version = {CONTACT_INDEX_VERSION}")
+    _mirror_checked.add(path)
+    return db
+
+
+def _sync_state(db, entity):
+    row = db.execute("SELECT cursor, synced_at, full_sync_at FROM sync_state WHERE entity = ?", (entity,)).fetchone()
+    return dict(zip(("cursor", "synced_at", "full_sync_at"), row)) if row else {}
+
+
+def _save_sync_state(db, entity, **fields):
+    state = {**_sync_state(db, entity), **fields}
+    db.execute(
+        "INSERT OR REPLACE INTO sync_state (entity, cursor, synced_at, full_sync_at) VALUES (?, ?, ?, ?)",
+        (entity, state.get("cursor"), state.get("synced_at"), state.get("full_sync_at")),
+    )
+
+
+def _contact_search_text(c):
+    fields = (c.get("firstName"), c.get("lastName"), c.get("contactName"), c.get("email"),
+              c.get("phone"), c.get("companyName"))
+    return " ".join(_terms(" ".join(str(f) for f in fields if f)))
+
+
+def _normalize_email(value):
+    value = str(value or "").strip().lower()
+    return value if "@" in value else None
+
+
+def _normalize_phone(value):
+    """E.164 form of a full or partial phone number, e.g. "(416) 555-0101" -> "+14165550101"."""
+    raw = str(value or "").strip()
+    digits = re.sub(r"\D", "", raw)
+    if not digits:
+        return None
+    if raw.startswith("+"):
+        return f"+{digits}"
+    if digits.startswith("00"):
+        return f"+{digits[2:]}"
+    if len(digits) > 10 and digits.startswith(DEFAULT_COUNTRY_CODE):
+        return f"+{digits}"
+    return f"+{DEFAULT_COUNTRY_CODE}{digits}"
+
+
+def _terms(text):
+    return re.findall(r"[a-z0-9]+", str(text or "").lower())
+
+
+def _trigrams(text):
+    text = " ".join(_terms(text))
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _contact_index_keys(c):
+    """Index keys per lookup table for one contact."""
+    emails = [c.get("email")] + [e.get("email") if isinstance(e, dict) else e for e in c.get("additionalEmails") or []]
+    phones = [c.get("phone")] + [p.get("phone") if isinstance(p, dict) else p for p in c.get("additionalPhones") or []]
+    names = " ".join(str(c.get(k) or "") for k in ("firstName", "lastName", "contactName", "companyName"))
+    local_parts = " ".join(e.split("@")[0] for e in emails if e)
+    return {
+        "contact_emails": {e for e in map(_normalize_email, emails) if e},
+        "contact_phones": {p for p in map(_normalize_phone, phones) if p},
+        "contact_terms": set(_terms(f"{names} {local_parts}")),
+        "contact_trigrams": _trigrams(names),
+        "contact_tags": {str(t).strip().lower() for t in c.get("tags") or [] if str(t).strip()},
+    }
+
+
+def _index_contacts(db, contacts):
+    ids = [(c["id"],) for c in contacts]
+    for table in CONTACT_INDEXES:
+        db.executemany(f"DELETE FROM {table} WHERE id = ?", ids)
+    for c in contacts:
+        for table, keys in _contact_index_keys(c).items():
+            db.executemany(f"INSERT OR IGNORE INTO {table} (key, id) VALUES (?, ?)", ((k, c["id"]) for k in keys))
+
+
+def _store_contacts(db, contacts):
+    contacts = [{k: v for k, v in c.items() if k != "searchAfter"} for c in contacts if c.get("id")]
+    db.executemany(
+        "INSERT OR REPLACE INTO contacts (id, updated, search, data) VALUES (?, ?, ?, ?)",
+        [(c["id"], c.get("dateUpdated") or c.get("dateAdded"), _contact_search_text(c), _json_compact(c)) for c in contacts],
+    )
+    _index_contacts(db, contacts)
+
+
+def _sweep(db, table, seen_ids):
+    """After a complete full load, drop mirrored rows the API no longer returns."""
+    db.execute("CREATE TEMP TABLE IF NOT EXISTS seen (id TEXT PRIMARY KEY)")
+    db.execute("DELETE FROM seen")
+    db.executemany("INSERT OR IGNORE INTO seen (id) VALUES (?)", ((i,) for i in seen_ids))
+    deleted = db.execute(f"DELETE FROM {table} WHERE id NOT IN (SELECT id FROM seen)").rowcount
+    if table == "contacts" and deleted:
+        for index in CONTACT_INDEXES:
+            db.execute(f"DELETE FROM {index} WHERE id NOT IN (SELECT id FROM seen)")
+    return deleted
+
+
+def _sync_contacts(db, full):
+    """Pull contacts changed since the stored dateUpdated cursor via the search API, oldest first."""
+    cursor = None if full else _sync_state(db, "contacts").get("cursor")
+    body = {"locationId": _loc(), "pageLimit": 100, "sort": [{"field": "dateUpdated", "direction": "asc"}]}
+    if cursor:
+        # gte rather than gt: records sharing the cursor's timestamp are re-read, never skipped
+        body["filters"] = [{"field": "dateUpdated", "operator": "range", "value": {"gte": cursor}}]
+
+    fetched, error, seen = 0, None, set()
+    while True:
+        data = _post("/contacts/search", body, idempotent=True)
+        if "error" in data:
+            error = data
+            break
+        rows = data.get("contacts", [])
+        with db:
+            _store_contacts(db, rows)
+            fetched += len(rows)
+            if full:
+                seen.update(c["id"] for c in rows if c.get("id"))
+            stamps = [c.get("dateUpdated") for c in rows if c.get("dateUpdated")]
+            if stamps:
+                cursor = max(stamps + ([cursor] if cursor else []))
+                _save_sync_state(db, "contacts", cursor=cursor)
+        if len(rows) < body["pageLimit"]:
+            break
+        search_after = rows[-1].get("searchAfter")
+        if search_after:
+            body["searchAfter"] = search_after
+        else:
+            body["page"] = body.get("page", 1) + 1
+
+    result = {"mode": "full" if full else ("incremental" if body.get("filters") else "initial"), "fetched": fetched}
+    if error:
+        return {**result, "complete": False, "error": error}
+    with db:
+        now = time.time()
+        if full:
+            result["deleted"] = _sweep(db, "contacts", seen)
+        _save_sync_state(db, "contacts", synced_at=now, **({"full_sync_at": now} if full or not body.get("filters") else {}))
+    return {**result, "complete": True}
+
+
+def _sync_opportunities(db, full):
+    """Walk the opportunity search and rewrite only rows whose updatedAt moved.
+
+    The opportunities search endpoint has no updated-since filter, so every page
+    is read, but unchanged opportunities are never rewritten.
+    """
+    paged = _Paged("/opportunities/search", max_pages=None)
+    fetched = changed = 0
+    cursor = _sync_state(db, "opportunities").get("cursor")
+    seen = set()
+    for page in paged.iter_pages():
+        ids = [o["id"] for o in page if o.get("id")]
+        known = dict(db.execute(
+            f"SELECT id, updated FROM opportunities WHERE id IN ({','.join('?' * len(ids))})", ids
+        ).fetchall()) if ids else {}
+        rows = []
+        for o in page:
+            updated = o.get("updatedAt") or o.get("dateUpdated")
+            if o.get("id") and (full or known.get(o["id"]) != updated):
+                rows.append((o["id"], o.get("pipelineId"), updated, _json_compact(o)))
+            if updated and (not cursor or updated > cursor):
+                cursor = updated
+        with db:
+            db.executemany("INSERT OR REPLACE INTO opportunities (id, pipeline_id, updated, data) VALUES (?, ?, ?, ?)", rows)
+        fetched += len(page)
+        changed += len(rows)
+        seen.update(ids)
+
+    result = {"mode": "full" if full else "changed-only", "fetched": fetched, "changed": changed}
+    if not paged.complete:
+        return {**result, "complete": False, "error": paged.error}
+    with db:
+        now = time.time()
+        # Every page was read, so a deletion sweep is always safe here
+        result["deleted"] = _sweep(db, "opportunities", seen)
+        _save_sync_state(db, "opportunities", cursor=cursor, synced_at=now, full_sync_at=now)
+    return {**result, "complete": True}
+
+
+def _sync_pipelines(db, full):
+    data = list_pipelines()
+    if "error" in data:
+        return {"complete": False, "error": data}
+    pipelines = data.get("pipelines", [])
+    with db:
+        db.execute("DELETE FROM pipelines")
+        db.executemany("INSERT INTO pipelines (id, data) VALUES (?, ?)", [(p["id"], _json_compact(p)) for p in pipelines])
+        now = time.time()
+        _save_sync_state(db, "pipelines", synced_at=now, full_sync_at=now)
+    return {"fetched": len(pipelines), "complete": True}
+
+
+_SYNCERS = {"contacts": _sync_contacts, "opportunities": _sync_opportunities, "pipelines": _sync_pipelines}
+
+
+def sync(*entities):
+    """Update the local SQLite mirror. Default: contacts, opportunities and pipelines.
+
+    The first run loads everything; later runs pull only contacts updated since
+    the last sync. Pass --full to reload everything and drop deleted records.
+    """
+    full = "--full" in entities
+    entities = [e for e in entities if e != "--full"] or list(_SYNCERS)
+    unknown = [e for e in entities if e not in _SYNCERS]
+    if unknown:
+        return {"error": "unknown_entity", "message": f"Can sync: {', '.join(_SYNCERS)}. Got: {', '.join(unknown)}"}
+    started = time.time()
+    db = _mirror_db()
+    try:
+        results = {entity: _SYNCERS[entity](db, full) for entity in entities}
+    finally:
+        db.close()
+    return {"locationId": _loc(), "mirror": _mirror_path(), "elapsed_s": round(time.time() - started, 2), **results}
+
+
+class _MirrorPaged(_Paged):
+    """A _Paged whose pages come from a mirror query instead of the API.
+    It owns `db` and closes it once iteration ends."""
+
+    def __init__(self, db, item_key, endpoint, sql, params=()):
+        super().__init__(endpoint)
+        self.item_key = item_key
+        self._db, self._sql, self._sql_params = db, sql, params
+
+    def iter_pages(self):
+        try:
+            rows = self._db.execute(self._sql, self._sql_params)
+            while True:
+                batch = rows.fetchmany(500)
+                if not batch:
+                    self.complete = True
+                    return
+                self.pages += 1
+                self.total += len(batch)
+                yield [json.loads(r[0]) for r in batch]
+        finally:
+            self._db.close()
+
+    def summary(self):
+        return {**super().summary(), "source": "mirror"}
+
+
+_PHONE_QUERY = re.compile(r"^\+?[\d\s().-]{3,}$")
+
+
+def _contact_match_sql(db, query):
+    """SQL selecting ids of contacts matching a search query via the lookup indexes.
+
+    Routing: "tag:a tag:b" -> tag index (all tags), anything with "@" -> exact
+    email, phone-like text -> E.164 prefix, otherwise every word must prefix-match
+    a name/company/email word, falling back to trigram substring match.
+    """
+    words = query.split()
+    if all(w.lower().startswith("tag:") for w in words):
+        tags = [w[4:].strip().lower() for w in words]
+        return " INTERSECT ".join(["SELECT id FROM contact_tags WHERE key = ?"] * len(tags)), tags
+    if "@" in query:
+        return "SELECT id FROM contact_emails WHERE key = ?", [_normalize_email(query)]
+    if _PHONE_QUERY.match(query) and len(re.sub(r"\D", "", query)) >= 3:
+        phone = _normalize_phone(query)
+        return "SELECT id FROM contact_phones WHERE key >= ? AND key < ?", [phone, phone + "\x7f"]
+
+    terms = _terms(query)
+    if terms:
+        sql = " INTERSECT ".join(["SELECT id FROM contact_terms WHERE key >= ? AND key < ?"] * len(terms))
+        params = [p for t in terms for p in (t, t + "\x7f")]
+        if db.execute(f"SELECT EXISTS ({sql})", params).fetchone()[0]:
+            return sql, params
+    grams = sorted(_trigrams(query))
+    if not grams:
+        return "SELECT id FROM contacts WHERE search LIKE ?", [f"%{' '.join(_terms(query))}%"]
+    sql = " INTERSECT ".join(["SELECT id FROM contact_trigrams WHERE key = ?"] * len(grams))
+    return f"SELECT id FROM contacts WHERE id IN ({sql}) AND search LIKE ?", grams + [f"%{' '.join(_terms(query))}%"]
+
+
+def _mirror_search_contacts(db, query=""):
+    query = query.strip()
+    if not query:
+        return _MirrorPaged(db, "contacts", "/contacts/", "SELECT data FROM contacts ORDER BY id")
+    sql, params = _contact_match_sql(db, query)
+    return _MirrorPaged(db, "contacts", "/contacts/", f"SELECT data FROM contacts WHERE id IN ({sql}) ORDER BY id", params)
+
+
+def _mirror_get(db, table, key, record_id):
+    row = db.execute(f"SELECT data FROM {table} WHERE id = ?", (record_id,)).fetchone()
+    return {key: json.loads(row[0]), "source": "mirror"} if row else None
+
+
+# command -> (entity whose freshness matters, reader(db, *args) returning a result or None on miss)
+_MIRROR_READERS = {
+    "search_contacts": ("contacts", _mirror_search_contacts),
+    "list_all_contacts": ("contacts", lambda db: _mirror_search_contacts(db)),
+    "get_contact": ("contacts", lambda db, cid: _mirror_get(db, "contacts", "contact", _validate_id(cid, "contact_id"))),
+    "list_opportunities": ("opportunities", lambda db: _MirrorPaged(
+        db, "opportunities", "/opportunities/search", "SELECT data FROM opportunities ORDER BY id")),
+    "get_opportunity": ("opportunities", lambda db, oid: _mirror_get(
+        db, "opportunities", "opportunity", _validate_id(oid, "opportunity_id"))),
+    "list_pipelines": ("pipelines", lambda db: {
+        "pipelines": [json.loads(r[0]) for r in db.execute("SELECT data FROM pipelines ORDER BY id")], "source": "mirror"}),
+}
+
+
+def _mirror_read(command, args, local_only=False, max_age=None):
+    """Answer a read command from the mirror. Returns None to fall through to the API."""
+    entity, reader = _MIRROR_READERS.get(command, (None, None))
+    if reader is None:
+        return {"error": "not_mirrored", "message": f"'{command}' cannot be answered from the mirror."} if local_only else None
+    if not os.path.exists(_mirror_path()):
+        return {"error": "mirror_empty", "message": f"No {entity} in the local mirror yet; run sync."} if local_only else None
+    db, result = _mirror_db(), None
+    try:
+        synced_at = _sync_state(db, entity).get("synced_at")
+        if not synced_at:
+            return {"error": "mirror_empty", "message": f"No {entity} in the local mirror yet; run sync."} if local_only else None
+        age = time.time() - synced_at
+        if max_age is not None and age > max_age:
+            if local_only:
+                return {"error": "mirror_stale", "message": f"Mirror {entity} are {int(age)}s old (limit {max_age}s); run sync."}
+            return None
+        try:
+            result = reader(db, *args)
+        except TypeError:
+            if local_only:
+                return {"error": "missing_argument", "message": f"Command '{command}' requires additional arguments."}
+            return None
+        if result is None and local_only:
+            return {"error": 404, "message": "Not found in the local mirror.", "source": "mirror"}
+        return result
+    finally:
+        # A _MirrorPaged result reads from the connection lazily and closes it itself
+        if not isinstance(result, _MirrorPaged):
+            db.close()
+
+
+# ──────────────────────────────────────────────
+# Async Client (bounded concurrency)
+# ──────────────────────────────────────────────
+
+ASYNC_CONCURRENCY = _env_int("HIGHLEVEL_CONCURRENCY", 8)
+
+
+def _endpoint(name):
+    """Look up a public endpoint function of this module by name, or None."""
+    func = globals().get(name)
+    if name.startswith("_") or not inspect.isfunction(func) or func.__module__ != __name__:
+        return None
+    return func
+
+
+class AsyncGHL:
+    """asyncio counterpart of every endpoint function, with a concurrency limit.
+
+    Each endpoint is available as a coroutine of the same name, e.g.
+    ``await client.get_contact(cid)``. Calls run on worker threads over the
+    shared keep-alive pool, so they go through the same _validate_id checks and
+    draw from the same per-location rate budget as the blocking functions.
+
+        async with AsyncGHL(concurrency=10) as client:
+            contacts = await asyncio.gather(*(client.get_contact(c) for c in ids))
+    """
+
+    def __init__(self, concurrency=None):
+        self.concurrency = max(1, concurrency or ASYNC_CONCURRENCY)
+        self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="ghl-async")
+        self._sem = None
+
+    async def call(self, func, *args, **kwargs):
+        """Run a blocking endpoint function under the concurrency limit."""
+        if self._sem is None:
+            self._sem = asyncio.Semaphore(self.concurrency)
+        async with self._sem:
+            ctx = contextvars.copy_context()
+            return await asyncio.get_running_loop().run_in_executor(
+                self._executor, functools.partial(ctx.run, func, *args, **kwargs)
+            )
+
+    async def gather(self, calls):
+        """Run (command_name, *args) tuples concurrently; results come back in input order.
+
+        Validation and other errors are returned in place as {"error": ...} dicts
+        so one bad ID does not cancel the rest of the fan-out.
+        """
+        async def one(name, *args):
+            try:
+                return await getattr(self, name)(*args)
+            except AttributeError as e:
+                return {"error": "unknown_command", "message": str(e)}
+            except ValueError as e:
+                return {"error": "validation_failed", "message": str(e)}
+
+        return await asyncio.gather(*(one(*call) for call in calls))
+
+    def __getattr__(self, name):
+        func = _endpoint(name)
+        if func is None:
+            raise AttributeError(f"Unknown GHL endpoint: {name}")
+
+        @functools.wraps(func)
+        async def method(*args, **kwargs):
+            return await self.call(func, *args, **kwargs)
+
+        return method
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.close()
+
+
+def run_concurrently(calls, concurrency=None):
+    """Blocking helper: run (command_name, *args) tuples through AsyncGHL and return ordered results."""
+    async def main():
+        async with AsyncGHL(concurrency) as client:
+            return await client.gather(calls)
+
+    return asyncio.run(main())
+
+
+# ──────────────────────────────────────────────
+# Batch Execution
+# ──────────────────────────────────────────────
+
+# "${step_id.path.to.value}" in a step's args is replaced by that earlier step's result
+_STEP_REF = re.compile(r"\$\{([A-Za-z0-9_-]+)((?:\.[^.}]+)*)\}")
+
+
+def _step_refs(value):
+    if isinstance(value, str):
+        return {m.group(1) for m in _STEP_REF.finditer(value)}
+    if isinstance(value, (list, dict)):
+        items = value.values() if isinstance(value, dict) else value
+        return set().union(*(_step_refs(v) for v in items)) if items else set()
+    return set()
+
+
+def _resolve_step_refs(value, results):
+    def lookup(m):
+        found = results[m.group(1)]
+        for part in m.group(2).split(".")[1:]:
+            found = found[int(part)] if isinstance(found, list) else found[part]
+        return found
+
+    if isinstance(value, str):
+        whole = _STEP_REF.fullmatch(value)
+        return lookup(whole) if whole else _STEP_REF.sub(lambda m: str(lookup(m)), value)
+    if isinstance(value, list):
+        return [_resolve_step_refs(v, results) for v in value]
+    if isinstance(value, dict):
+        return {k: _resolve_step_refs(v, results) for k, v in value.items()}
+    return value
+
+
+def _load_steps(source):
+    """Parse batch steps from a JSON array or NDJSON (one step per line).
+
+    A step is {"id": ..., "command": ..., "args": [...], "after": [...]} or the
+    short form ["command", arg, ...]; ids default to the 1-based position.
+    """
+    if source == "-":
+        text = sys.stdin.read()
+    else:
+        with open(source, encoding="utf-8") as f:
+            text = f.read()
+    try:
+        doc = json.loads(text)
+        raw = doc if isinstance(doc, list) and all(isinstance(x, (dict, list)) for x in doc) else [doc]
+    except ValueError:
+        raw = [json.loads(line) for line in text.splitlines() if line.strip()]
+    steps = []
+    for n, item in enumerate(raw, 1):
+        if isinstance(item, list):
+            item = {"command": item[0] if item else None, "args": item[1:]}
+        if not isinstance(item, dict) or not isinstance(item.get("command"), str):
+            raise ValueError(f"Step {n} needs a command name.")
+        args = item.get("args", [])
+        steps.append({
+            "id": str(item.get("id", n)), "command": item["command"],
+            "args": args if isinstance(args, list) else [args],
+            "after": [str(a) for a in item.get("after", [])],
+        })
+    return steps
+
+
+def batch(source="-", *options):
+    """Run many commands in one process from a file (or "-" for stdin).
+
+    Steps run in order; with --parallel N, steps whose dependencies are done run
+    concurrently. A step depends on the steps named in its "after" list and on
+    any step it references with ${id.path}; if one of those fails it is skipped.
+    Results come back in input order with per-step status and timing.
+    """
+    opts = dict(zip(options[::2], options[1::2]))
+    parallel = max(1, int(opts.get("--parallel") or 1))
+    try:
+        steps = _load_steps(source)
+    except (OSError, ValueError, IndexError) as e:
+        return {"error": "bad_input", "message": str(e)}
+
+    seen = set()
+    for step in steps:
+        if step["id"] in seen:
+            return {"error": "bad_input", "message": f"Duplicate step id: {step['id']}"}
+        step["deps"] = set(step["after"]) | _step_refs(step["args"])
+        unknown = step["deps"] - seen
+        if unknown:
+            return {"error": "bad_input", "message": f"Step {step['id']} depends on unknown or later steps: {', '.join(sorted(unknown))}"}
+        if step["command"] in ("batch", "serve"):
+            return {"error": "bad_input", "message": f"Step {step['id']}: '{step['command']}' cannot run inside a batch."}
+        seen.add(step["id"])
+
+    results, failed, outcomes = {}, set(), {}
+
+    def execute(step):
+        outcome = {"id": step["id"], "command": step["command"]}
+        blocked = step["deps"] & failed
+        if blocked:
+            return {**outcome, "status": "skipped", "message": f"Depends on failed step(s): {', '.join(sorted(blocked))}"}
+        started = time.monotonic()
+        try:
+            args = _resolve_step_refs(step["args"], results)
+        except (KeyError, IndexError, TypeError, ValueError) as e:
+            result = {"error": "unresolved_reference", "message": f"Could not resolve a reference: {e}"}
+        else:
+            try:
+                result = run_command(step["command"], args)
+            except Exception as e:
+                result = {"error": "unexpected", "message": str(e)}
+        if isinstance(result, _Paged):
+            result = result.to_dict()
+        status = "error" if isinstance(result, dict) and "error" in result else "ok"
+        return {**outcome, "status": status, "elapsed_ms": round((time.monotonic() - started) * 1000, 1), "result": result}
+
+    def record(step, outcome):
+        outcomes[step["id"]] = outcome
+        if outcome["status"] == "ok":
+            results[step["id"]] = outcome["result"]
+        else:
+            failed.add(step["id"])
+
+    started = time.monotonic()
+    if parallel == 1:
+        for step in steps:
+            record(step, execute(step))
+    else:
+        waiting = list(steps)
+        with ThreadPoolExecutor(max_workers=parallel, thread_name_prefix="ghl-batch") as pool:
+            running = {}
+            while waiting or running:
+                for step in [s for s in waiting if s["deps"] <= outcomes.keys()]:
+                    waiting.remove(step)
+                    running[pool.submit(contextvars.copy_context().run, execute, step)] = step
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    record(running.pop(future), future.result())
+
+    ordered = [outcomes[step["id"]] for step in steps]
+    return {
+        "steps": ordered,
+        "succeeded": sum(o["status"] == "ok" for o in ordered),
+        "failed": sum(o["status"] == "error" for o in ordered),
+        "skipped": sum(o["status"] == "skipped" for o in ordered),
+        "elapsed_ms": round((time.monotonic() - started) * 1000, 1),
+    }
+
+
+# ──────────────────────────────────────────────
+# Multi-Location Fan-Out
+# ──────────────────────────────────────────────
+
+FANOUT_CONCURRENCY = _env_int("HIGHLEVEL_FANOUT_CONCURRENCY", 8)
+
+
+def _load_locations():
+    """Configured sub-accounts as {location_id: token}.
+
+    HIGHLEVEL_LOCATIONS is a JSON object {"<location_id>": "<token>" or null} or a
+    comma-separated list like "locA,locB=tokenB"; HIGHLEVEL_LOCATIONS_FILE may hold
+    the JSON instead. Locations without their own token use HIGHLEVEL_TOKEN.
+    """
+    raw = os.environ.get("HIGHLEVEL_LOCATIONS", "").strip()
+    path = os.environ.get("HIGHLEVEL_LOCATIONS_FILE", "").strip()
+    if path:
+        with open(os.path.expanduser(path)) as f:
+            raw = f.read().strip()
+    if not raw:
+        return {LOC_ID: TOKEN} if LOC_ID else {}
+    if raw.startswith("{"):
+        mapping = json.loads(raw)
+    else:
+        mapping = dict((part.split("=", 1) + [None])[:2] for part in raw.split(",") if part.strip())
+    return {_validate_id(loc.strip(), "location_id"): (token or TOKEN).strip() for loc, token in mapping.items()}
+
+
+def _select_locations(spec):
+    """Resolve --locations ("all" or "id1,id2") against the configured sub-accounts."""
+    known = _load_locations()
+    if spec == "all":
+        return known
+    return {loc: known.get(loc, TOKEN) for loc in (_validate_id(x.strip(), "location_id") for x in spec.split(","))}
+
+
+# Only read commands fan out; a write run against every sub-account is never what was meant
+_FAN_OUT_PREFIXES = ("list_", "get_", "search_")
+_FAN_OUT_COMMANDS = {"test_connection", "rate_limit_status"}
+
+
+class _FanOutPaged(_Paged):
+    """One command run against several locations concurrently, merged into a single
+    stream in arrival order. Every record is tagged with its locationId; each
+    location is paced by its own rate-limit bucket."""
+
+    def __init__(self, command, args, locations, local_only=False, max_age=None):
+        super().__init__(command)
+        self.command, self.args = command, list(args)
+        self.locations = locations
+        self.local_only, self.max_age = local_only, max_age
+        self.by_location = {}
+
+    def _run_location(self, context, loc, token, out, slots):
+        def run():
+            _credentials.set((token, loc))
+            result = run_command(self.command, self.args, self.local_only, self.max_age)
+            if isinstance(result, _Paged):
+                for page in result.iter_pages():
+                    out.put((loc, result.item_key, page, None))
+                summary = result.summary()
+            elif isinstance(result, dict) and "error" in result:
+                summary = {"total": 0, "complete": False, "error": result}
+            else:
+                records = _records(result) if isinstance(result, dict) else None
+                key = next((k for k, v in result.items() if v is records), None) if records is not None else None
+                page = records if records is not None else [result]
+                out.put((loc, key, page, None))
+                summary = {"total": len(page), "complete": True}
+            out.put((loc, None, None, summary))
+
+        with slots:
+            try:
+                context.run(run)
+            except Exception as e:
+                out.put((loc, None, None, {"total": 0, "complete": False, "error": {"error": "unexpected", "message": str(e)}}))
+
+    def iter_pages(self):
+        out = queue.Queue(maxsize=max(2, len(self.locations) * 2))
+        slots = threading.Semaphore(FANOUT_CONCURRENCY)
+        context = contextvars.copy_context()
+        for loc, token in self.locations.items():
+            threading.Thread(target=self._run_location, args=(context.copy(), loc, token, out, slots),
+                             name=f"ghl-fanout-{loc}", daemon=True).start()
+
+        remaining = len(self.locations)
+        while remaining:
+            loc, key, page, summary = out.get()
+            if summary is not None:
+                remaining -= 1
+                self.by_location[loc] = {k: v for k, v in summary.items() if k in ("total", "complete", "truncated", "error")}
+                continue
+            self.item_key = self.item_key or key
+            for record in page:
+                if isinstance(record, dict):
+                    record.setdefault("locationId", loc)
+            self.pages += 1
+            self.total += len(page)
+            yield page
+        self.complete = all(s.get("complete") for s in self.by_location.values())
+
+    def summary(self):
+        return {"total": self.total, "command": self.command, "complete": self.complete, "locations": self.by_location}
+
+
+def fan_out(command, args, locations="all", local_only=False, max_age=None):
+    """Run a command for several locations at once. Returns a merged stream (iterate
+    for records, or .to_dict()) whose records carry their locationId."""
+    if not (command.startswith(_FAN_OUT_PREFIXES) or command in _FAN_OUT_COMMANDS):
+        return {"error": "validation_failed",
+                "message": f"--locations only runs read commands (list_*, get_*, search_*). Got: {command}"}
+    selected = _select_locations(locations) if isinstance(locations, str) else dict(locations)
+    if not selected:
+        return {"error": "no_locations", "message": "Set HIGHLEVEL_LOCATIONS (or HIGHLEVEL_LOCATION_ID) first."}
+    return _FanOutPaged(command, args, selected, local_only, max_age)
+
+
+# ──────────────────────────────────────────────
+# Daemon (JSON-RPC over a Unix socket or stdio)
+# ──────────────────────────────────────────────
+
+DAEMON_ENABLED = _env_flag("HIGHLEVEL_DAEMON")
+
+# Commands that read/write local files or manage the daemon always run in the calling process
+_IN_PROCESS_COMMANDS = {"export", "bulk_write", "bulk_get", "batch", "serve", "trace_report", "outbox_enqueue", "outbox_drain"}
+
+# Paginated listings stream page by page in constant memory only in the calling process; over
+# the socket they would arrive as one materialized document, so the thin client keeps them
+_STREAMING_COMMANDS = {
+    "search_contacts", "list_all_contacts", "list_opportunities", "list_workflows", "list_campaigns",
+    "list_invoices", "list_orders", "list_transactions", "list_subscriptions", "list_products",
+    "list_forms", "list_form_submissions", "list_surveys", "list_funnels",
+}
+
+# JSON-RPC errors after which the client may safely run the command itself: nothing was executed
+_RPC_NOT_EXECUTED = (-32001, -32601, -32600)
+
+
+def _daemon_socket_path():
+    configured = os.environ.get("HIGHLEVEL_DAEMON_SOCKET", "").strip()
+    return os.path.expanduser(configured) if configured else _state_path(f"daemon-{_loc() or 'default'}.sock")
+
+
+def _credential_fingerprint():
+    """Short hash identifying the token/location pair, so a client never borrows another account's daemon."""
+    return hashlib.sha256(f"{_token()}|{_loc()}".encode()).hexdigest()[:16]
+
+
+def _rpc_error(rid, code, message):
+    return {"jsonrpc": "2.0", "id": rid, "error": {"code": code, "message": message}}
+
+
+def _handle_rpc(request):
+    """Execute one JSON-RPC 2.0 request. Returns the response, or None for a notification.
+
+    params may be a list of command arguments, or an object with "args" and the
+    optional "local", "max_age", "priority", "deadline" (seconds, 0 for none)
+    and "fingerprint" fields the thin client sends.
+    """
+    if not isinstance(request, dict) or request.get("jsonrpc") != "2.0" or not isinstance(request.get("method"), str):
+        return _rpc_error(request.get("id") if isinstance(request, dict) else None, -32600, "Invalid Request")
+    rid, method = request.get("id"), request["method"]
+    params = request.get("params") or {}
+    if isinstance(params, list):
+        params = {"args": params}
+    if params.get("fingerprint") not in (None, _credential_fingerprint()):
+        return _rpc_error(rid, -32001, "Daemon is serving different credentials.")
+
+    if method == "ping":
+        result = {"pid": os.getpid(), "locationId": _loc()}
+    elif method == "stats":
+        result = stats_report()
+    elif method in COMMANDS and method not in _IN_PROCESS_COMMANDS:
+        seconds = params.get("deadline")
+        token = _priority.set(params.get("priority") if params.get("priority") in PRIORITY_CLASSES else None)
+        deadline = _deadline.set(None if not isinstance(seconds, (int, float)) else
+                                 time.monotonic() + seconds if seconds > 0 else float("inf"))
+        try:
+            result = run_command(method, params.get("args") or [], bool(params.get("local")), params.get("max_age"))
+            if isinstance(result, _Paged):
+                result = result.to_dict()
+        finally:
+            _deadline.reset(deadline)
+            _priority.reset(token)
+    else:
+        return _rpc_error(rid, -32601, f"Method not found: {method}")
+    return {"jsonrpc": "2.0", "id": rid, "result": result} if "id" in request else None
+
+
+def _handle_rpc_line(line, executor):
+    """Decode one line (a request or a batch array) and return the encoded response, or None."""
+    try:
+        message = json.loads(line)
+    except ValueError:
+        return _json_compact(_rpc_error(None, -32700, "Parse error"))
+    if isinstance(message, list):
+        if not message:
+            return _json_compact(_rpc_error(None, -32600, "Invalid Request"))
+        responses = [r for r in executor.map(_handle_rpc, message) if r is not None]
+        return _json_compact(responses) if responses else None
+    response = _handle_rpc(message)
+    return _json_compact(response) if response is not None else None
+
+
+class _RPCHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            if line.strip():
+                response = _handle_rpc_line(line, self.server.executor)
+                if response is not None:
+                    self.wfile.write(response.encode() + b"\n")
+                    self.wfile.flush()
+
+
+class _RPCServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def _serve_stdio(executor):
+    """Answer newline-delimited JSON-RPC on stdin/stdout; requests run concurrently."""
+    write_lock = threading.Lock()
+    sys.stdout.reconfigure(encoding="utf-8")  # JSON-RPC is UTF-8 whatever the locale
+
+    def answer(line):
+        response = _handle_rpc_line(line, executor)
+        if response is not None:
+            with write_lock:
+                sys.stdout.write(response + "\n")
+                sys.stdout.flush()
+
+    with ThreadPoolExecutor(max_workers=ASYNC_CONCURRENCY, thread_name_prefix="ghl-rpc") as requests:
+        for line in sys.stdin:
+            if line.strip():
+                requests.submit(answer, line)
+    return None
+
+
+def serve(*options):
+    """Run as a long-lived daemon that keeps connections, caches and limiter state warm.
+
+    Listens on a Unix socket (HIGHLEVEL_DAEMON_SOCKET or the state directory),
+    or on stdin/stdout with --stdio. Each line is a JSON-RPC 2.0 request whose
+    method is any CLI command name; ordinary CLI invocations forward to it
+    automatically while it runs.
+    """
+    executor = ThreadPoolExecutor(max_workers=ASYNC_CONCURRENCY, thread_name_prefix="ghl-rpc-batch")
+    if "--stdio" in options:
+        return _serve_stdio(executor)
+
+    path = _daemon_socket_path()
+    if os.path.exists(path):
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(path)
+            return {"error": "already_running", "message": f"A daemon is already listening on {path}"}
+        except OSError:
+            os.unlink(path)  # stale socket left by a daemon that died
+        finally:
+            probe.close()
+
+    old_umask = os.umask(0o177)
+    try:
+        server = _RPCServer(path, _RPCHandler)
+    finally:
+        os.umask(old_umask)
+    server.executor = executor
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    print(f"ghl-api daemon listening on {path} (pid {os.getpid()})", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if os.path.exists(path):
+            os.unlink(path)
+        _pool.close()
+    return {"status": "stopped", "socket": path}
+
+
+def _daemon_connect():
+    """Connected socket to the local daemon, or None if none is listening."""
+    try:
+        path = _daemon_socket_path()
+    except OSError:
+        return None  # no usable state directory, so no daemon socket either
+    if not os.path.exists(path):
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.settimeout(1.0)
+        sock.connect(path)
+    except OSError:
+        sock.close()
+        return None
+    return sock
+
+
+def _daemon_stats():
+    """The daemon's stats_report(), or None if it cannot be fetched."""
+    sock = _daemon_connect()
+    if sock is None:
+        return None
+    request = {"jsonrpc": "2.0", "id": 1, "method": "stats", "params": {"fingerprint": _credential_fingerprint()}}
+    with sock:
+        try:
+            sock.sendall(_json_compact(request).encode() + b"\n")
+            response = json.loads(sock.makefile("rb").readline() or b"{}")
+        except (OSError, ValueError):
+            return None
+    return response.get("result")
+
+
+def _forward_to_daemon(command, args, local_only=False, max_age=None):
+    """Run a command on the local daemon if one is listening.
+
+    Returns the result, or None when the caller should run the command itself
+    (no daemon, different credentials, or the daemon refused before executing).
+    Once a request has been sent, transport failures are reported, never retried
+    in-process, so a write cannot run twice.
+    """
+    if not DAEMON_ENABLED or command in _IN_PROCESS_COMMANDS or command in _STREAMING_COMMANDS:
+        return None
+    sock = _daemon_connect()
+    if sock is None:
+        return None
+
+    # An explicit --deadline travels as the seconds left (0 for none); otherwise the daemon applies its default
+    remaining = _remaining()
+    deadline = None if _deadline.get() is None else 0 if remaining is None else max(0.001, remaining)
+    request = {"jsonrpc": "2.0", "id": 1, "method": command, "params": {
+        "args": args, "local": local_only, "max_age": max_age, "priority": _priority.get(), "deadline": deadline,
+        "fingerprint": _credential_fingerprint()}}
+    with sock:
+        try:
+            sock.settimeout(None)
+            sock.sendall(_json_compact(request).encode() + b"\n")
+            line = sock.makefile("rb").readline()
+        except OSError as e:
+            return {"error": "daemon_failed", "message": str(e)}
+    if not line:
+        return {"error": "daemon_failed", "message": "Daemon closed the connection before replying."}
+    response = json.loads(line)
+    if "error" in response:
+        if response["error"].get("code") in _RPC_NOT_EXECUTED:
+            return None
+        return {"error": "daemon_failed", "message": response["error"].get("message")}
+    return response["result"]
+
+
 # ──────────────────────────────────────────────
 # CLI Router
 # ──────────────────────────────────────────────
 
 COMMANDS = {
-    "test_connection": lambda: test_connection(),
-    "search_contacts": lambda: search_contacts(sys.argv[2] if len(sys.argv) > 2 else ""),
-    "list_all_contacts": lambda: list_all_contacts(),
-    "get_contact": lambda: get_contact(sys.argv[2]),
-    "create_contact": lambda: create_contact(sys.argv[2]),
-    "update_contact": lambda: update_contact(sys.argv[2], sys.argv[3]),
-    "delete_contact": lambda: delete_contact(sys.argv[2]),
-    "upsert_contact": lambda: upsert_contact(sys.argv[2]),
-    "add_contact_tags": lambda: add_contact_tags(sys.argv[2], sys.argv[3]),
-    "list_conversations": lambda: list_conversations(),
-    "get_conversation": lambda: get_conversation(sys.argv[2]),
-    "send_message": lambda: send_message(sys.argv[2], sys.argv[3], sys.argv[4] if len(sys.argv) > 4 else "SMS"),
-    "send_email": lambda: send_email(
-        sys.argv[2],
-        sys.argv[3],
-        sys.argv[4],
-        sys.argv[5] if len(sys.argv) > 5 else None,
+    "test_connection": lambda a: test_connection(),
+    "search_contacts": lambda a: search_contacts(a[0] if len(a) > 0 else ""),
+    "list_all_contacts": lambda a: list_all_contacts(),
+    "get_contact": lambda a: get_contact(a[0]),
+    "create_contact": lambda a: create_contact(a[0]),
+    "update_contact": lambda a: update_contact(a[0], a[1]),
+    "delete_contact": lambda a: delete_contact(a[0]),
+    "upsert_contact": lambda a: upsert_contact(a[0]),
+    "add_contact_tags": lambda a: add_contact_tags(a[0], a[1]),
+    "list_conversations": lambda a: list_conversations(),
+    "get_conversation": lambda a: get_conversation(a[0]),
+    "send_message": lambda a: send_message(a[0], a[1], a[2] if len(a) > 2 else "SMS"),
+    "send_email": lambda a: send_email(
+        a[0],
+        a[1],
+        a[2],
+        a[3] if len(a) > 3 else None,
     ),
-    "list_calendars": lambda: list_calendars(),
-    "get_free_slots": lambda: get_free_slots(sys.argv[2], sys.argv[3], sys.argv[4]),
-    "create_appointment": lambda: create_appointment(sys.argv[2], sys.argv[3]),
-    "list_opportunities": lambda: list_opportunities(),
-    "get_opportunity": lambda: get_opportunity(sys.argv[2]),
-    "create_opportunity": lambda: create_opportunity(sys.argv[2]),
-    "list_pipelines": lambda: list_pipelines(),
-    "list_workflows": lambda: list_workflows(),
-    "add_to_workflow": lambda: add_to_workflow(sys.argv[2], sys.argv[3]),
-    "remove_from_workflow": lambda: remove_from_workflow(sys.argv[2], sys.argv[3]),
-    "list_campaigns": lambda: list_campaigns(),
-    "list_invoices": lambda: list_invoices(),
-    "get_invoice": lambda: get_invoice(sys.argv[2]),
-    "create_invoice": lambda: create_invoice(sys.argv[2]),
-    "list_orders": lambda: list_orders(),
-    "list_transactions": lambda: list_transactions(),
-    "list_subscriptions": lambda: list_subscriptions(),
-    "list_products": lambda: list_products(),
-    "get_product": lambda: get_product(sys.argv[2]),
-    "list_forms": lambda: list_forms(),
-    "list_form_submissions": lambda: list_form_submissions(sys.argv[2]),
-    "list_surveys": lambda: list_surveys(),
-    "list_funnels": lambda: list_funnels(),
-    "list_social_posts": lambda: list_social_posts(),
-    "create_social_post": lambda: create_social_post(sys.argv[2]),
-    "list_media": lambda: list_media(),
-    "list_users": lambda: list_users(),
-    "list_trigger_links": lambda: list_trigger_links(),
-    "get_location_details": lambda: get_location_details(),
-    "list_location_custom_fields": lambda: list_location_custom_fields(),
-    "list_location_tags": lambda: list_location_tags(),
-    "list_location_custom_values": lambda: list_location_custom_values(),
-    "list_courses": lambda: list_courses(),
-    "list_snapshots": lambda: list_snapshots(),
-    "get_snapshot_status": lambda: get_snapshot_status(sys.argv[2]),
+    "list_calendars": lambda a: list_calendars(),
+    "get_free_slots": lambda a: get_free_slots(a[0], a[1], a[2]),
+    "create_appointment": lambda a: create_appointment(a[0], a[1]),
+    "list_opportunities": lambda a: list_opportunities(),
+    "get_opportunity": lambda a: get_opportunity(a[0]),
+    "create_opportunity": lambda a: create_opportunity(a[0]),
+    "list_pipelines": lambda a: list_pipelines(),
+    "list_workflows": lambda a: list_workflows(),
+    "add_to_workflow": lambda a: add_to_workflow(a[0], a[1]),
+    "remove_from_workflow": lambda a: remove_from_workflow(a[0], a[1]),
+    "list_campaigns": lambda a: list_campaigns(),
+    "list_invoices": lambda a: list_invoices(),
+    "get_invoice": lambda a: get_invoice(a[0]),
+    "create_invoice": lambda a: create_invoice(a[0]),
+    "list_orders": lambda a: list_orders(),
+    "list_transactions": lambda a: list_transactions(),
+    "list_subscriptions": lambda a: list_subscriptions(),
+    "list_products": lambda a: list_products(),
+    "get_product": lambda a: get_product(a[0]),
+    "list_forms": lambda a: list_forms(),
+    "list_form_submissions": lambda a: list_form_submissions(a[0]),
+    "list_surveys": lambda a: list_surveys(),
+    "list_funnels": lambda a: list_funnels(),
+    "list_social_posts": lambda a: list_social_posts(),
+    "create_social_post": lambda a: create_social_post(a[0]),
+    "list_media": lambda a: list_media(),
+    "list_users": lambda a: list_users(),
+    "list_trigger_links": lambda a: list_trigger_links(),
+    "get_location_details": lambda a: get_location_details(),
+    "list_location_custom_fields": lambda a: list_location_custom_fields(),
+    "list_location_tags": lambda a: list_location_tags(),
+    "list_location_custom_values": lambda a: list_location_custom_values(),
+    "list_courses": lambda a: list_courses(),
+    "list_snapshots": lambda a: list_snapshots(),
+    "get_snapshot_status": lambda a: get_snapshot_status(a[0]),
+    "rate_limit_status": lambda a: rate_limit_status(),
+    "export": lambda a: export(a[0], a[1], *a[2:]),
+    "sync": lambda a: sync(*a[0:]),
+    "cache_clear": lambda a: cache_clear(a[0] if len(a) > 0 else None),
+    "cache_stats": lambda a: cache_stats(),
+    "bulk_write": lambda a: bulk_write(a[0], a[1], *a[2:]),
+    "bulk_get": lambda a: bulk_get(a[0], *a[1:]),
+    "outbox_enqueue": lambda a: outbox_enqueue(a[0], *a[1:]),
+    "outbox_drain": lambda a: outbox_drain(*a),
+    "outbox_status": lambda a: outbox_status(*a),
+    "outbox_retry": lambda a: outbox_retry(*a),
+    "batch": lambda a: batch(*a),
+    "trace_report": lambda a: trace_report(*a),
+    "serve": lambda a: serve(*a),
 }
 
+
+def _pop_flag(name):
+    """Remove a boolean --flag from sys.argv, returning whether it was present."""
+    if name in sys.argv[1:]:
+        sys.argv.remove(name)
+        return True
+    return False
+
+
+def _pop_option(name):
+    """Remove a --name VALUE option from sys.argv, returning VALUE or None."""
+    if name in sys.argv[1:-1]:
+        i = sys.argv.index(name, 1)
+        value = sys.argv[i + 1]
+        del sys.argv[i:i + 2]
+        return value
+    return None
+
+
+def run_command(name, args=(), local_only=False, max_age=None):
+    """Run one COMMANDS entry with a list of arguments, returning its result.
+
+    Argument problems come back as the same validation_failed / missing_argument
+    error results the CLI prints, so every front end reports them alike.
+    """
+    span = _tracer.start("command", name, args=len(args))
+    if span is None:
+        return _run_command(name, args, local_only, max_age)
+    token = _current_span.set(span)
+    try:
+        result = _run_command(name, args, local_only, max_age)
+    except BaseException as e:
+        span.end(status=type(e).__name__)
+        raise
+    finally:
+        _current_span.reset(token)
+    if isinstance(result, _Paged):
+        return _traced_pages(result, span)
+    span.end(status="error" if isinstance(result, dict) and "error" in result else "ok")
+    return result
+
+
+def _run_command(name, args, local_only, max_age):
+    if name not in COMMANDS:
+        return {"error": "unknown_command", "message": f"Unknown command: {name}"}
+    args = list(args)
+    # Bulk commands yield the rate budget to interactive ones unless a priority was chosen explicitly
+    token = _priority.set("bulk") if name in _BULK_COMMANDS and _priority.get() is None else None
+    # Single interactive commands get the default time budget; bulk and long-running ones none
+    bounded = _request_priority() == "interactive" and name not in _IN_PROCESS_COMMANDS and COMMAND_DEADLINE_S > 0
+    deadline = _deadline.set(time.monotonic() + COMMAND_DEADLINE_S if bounded else float("inf")) \
+        if _deadline.get() is None else None
+    try:
+        result = None
+        if local_only or max_age is not None:
+            result = _mirror_read(name, args, local_only, max_age)
+        if result is None and name in _OUTBOX_COMMANDS:
+            if OUTBOX_ENABLED:
+                result = _outbox_send(name, args)
+            elif _pop_key(args) is not None:
+                # --key only means something to the outbox; never pass it on as a positional argument
+                print(f"Outbox is off (HIGHLEVEL_OUTBOX); ignoring --key for {name}.", file=sys.stderr)
+        return result if result is not None else COMMANDS[name](args)
+    except ValueError as e:
+        return {"error": "validation_failed", "message": str(e)}
+    except IndexError:
+        return {"error": "missing_argument", "message": f"Command '{name}' requires additional arguments."}
+    finally:
+        if deadline:
+            _deadline.reset(deadline)
+        if token:
+            _priority.reset(token)
+
+
 if __name__ == "__main__":
+    show_stats = _pop_flag("--stats")
+    OUTPUT_FORMAT = "ndjson" if _pop_flag("--ndjson") else (_pop_option("--format") or OUTPUT_FORMAT)
+    if OUTPUT_FORMAT not in OUTPUT_FORMATS:
+        print(f"--format must be one of: {', '.join(OUTPUT_FORMATS)}", file=sys.stderr)
+        sys.exit(1)
+    if OUTPUT_FORMAT != "pretty":
+        sys.stdout.reconfigure(encoding="utf-8")  # compact output keeps non-ASCII text as UTF-8
+    fields = [f.strip() for f in (_pop_option("--fields") or "").split(",") if f.strip()]
+    _streaming.set(True)
+    local_only = _pop_flag("--local")
+    max_age = _pop_option("--max-age") or os.environ.get("HIGHLEVEL_MIRROR_MAX_AGE", "").strip() or None
+    locations = _pop_option("--locations")
+    trace_path = _pop_option("--trace")
+    if trace_path:
+        _tracer.path = trace_path
+    priority = _pop_option("--priority")
+    if priority is not None and priority not in PRIORITY_CLASSES:
+        print(f"--priority must be one of: {', '.join(PRIORITY_CLASSES)}", file=sys.stderr)
+        sys.exit(1)
+    _priority.set(priority)
+    deadline = _pop_option("--deadline")
+    try:
+        deadline = float(deadline) if deadline is not None else None
+    except ValueError:
+        print(f"--deadline must be a number of seconds. Got: {deadline!r}", file=sys.stderr)
+        sys.exit(1)
+    if deadline is not None:
+        _deadline.set(time.monotonic() + deadline if deadline > 0 else float("inf"))
+    forwarded = False
+    if show_stats:
+        # A forwarded command ran in the daemon, so its counters live there
+        def _print_stats():
+            report = _daemon_stats() if forwarded else None
+            if report is not None:
+                report = {"source": "daemon", **report}
+            elif forwarded:
+                report = {"source": "local", "note": "Daemon stats unavailable; counters are this client's only.", **stats_report()}
+            print(json.dumps(report or stats_report()), file=sys.stderr)
+        atexit.register(_print_stats)
+
     if len(sys.argv) < 2 or sys.argv[1] not in COMMANDS:
         print(f"Commands: {', '.join(sorted(COMMANDS.keys()))}")
         sys.exit(1)
     try:
-        _out(COMMANDS[sys.argv[1]]())
-    except ValueError as e:
-        _out({"error": "validation_failed", "message": str(e)})
+        max_age = float(max_age) if max_age is not None else None
+    except ValueError:
+        _out({"error": "validation_failed", "message": f"--max-age must be a number of seconds. Got: {max_age!r}"})
         sys.exit(1)
-    except IndexError:
-        _out({"error": "missing_argument", "message": f"Command '{sys.argv[1]}' requires additional arguments."})
+
+    command, args = sys.argv[1], sys.argv[2:]
+    if locations:
+        try:
+            result = fan_out(command, args, locations, local_only, max_age)
+        except (OSError, ValueError) as e:
+            result = {"error": "validation_failed", "message": f"--locations: {e}"}
+    else:
+        # Spans are only written by the process that runs the command, so --trace runs it here
+        result = None if trace_path else _forward_to_daemon(command, args, local_only, max_age)
+        forwarded = result is not None
+        if result is None:
+            result = run_command(command, args, local_only, max_age)
+    if result is not None:
+        try:
+            _out(result, fields=fields)
+        except BrokenPipeError:
+            # Reader went away (e.g. piped into head); stop streaming quietly
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+    if isinstance(result, dict) and result.get("error") in ("validation_failed", "missing_argument"):
         sys.exit(1)
@@ -0,0 +1,439 @@
+#!/usr/bin/env python3
+"""Local stand-in for the GoHighLevel API v2, for offline testing and benchmarks.
+
+Usage: python3 mock-server.py [--port 8089] [--contacts 5000] [--latency-ms 50]
+                              [--rate-429 0.02] [--retry-after 1] [--rate-5xx 0.01]
+                              [--fixtures data.json] [--seed 1]
+
+Point the client at it with:
+  HIGHLEVEL_BASE_URL=http://127.0.0.1:8089 HIGHLEVEL_TOKEN=mock HIGHLEVEL_LOCATION_ID=mockloc
+
+Serves the endpoints ghl-api.py calls from synthetic records (or a fixtures file
+of {"contacts": [...], "opportunities": [...], ...} and recorded responses keyed
+"GET /path"). List endpoints page with meta.startAfter/startAfterId like GHL;
+writes are kept in memory. Every response carries X-RateLimit-* headers, and
+latency, 429s (with Retry-After) and 5xx errors can be injected at random.
+Bodies over 1 KB are gzipped when the client accepts it (--no-gzip to disable).
+GET /__mock__/stats reports request and injected-fault counts.
+"""
+
+import argparse, gzip, hashlib, json, random, sys, threading, time, urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_PORT = 8089
+PAGE_LIMIT_MAX = 100
+GZIP_MIN_BYTES = 1024  # smaller bodies are sent as-is, like most real servers
+
+# Paginated list endpoints and the response key their records sit under
+LIST_ENDPOINTS = {
+    "/contacts/": "contacts",
+    "/opportunities/search": "opportunities",
+    "/invoices/": "invoices",
+    "/products/": "products",
+    "/forms/": "forms",
+    "/forms/submissions": "submissions",
+    "/surveys/": "surveys",
+    "/campaigns/": "campaigns",
+    "/workflows/": "workflows",
+    "/funnels/funnel/list": "funnels",
+    "/payments/orders/": "orders",
+    "/payments/transactions/": "transactions",
+    "/payments/subscriptions/": "subscriptions",
+    "/conversations/search": "conversations",
+}
+
+# Unpaginated metadata endpoints: path -> response key
+META_ENDPOINTS = {
+    "/opportunities/pipelines": "pipelines",
+    "/calendars/": "calendars",
+    "/users/": "users",
+    "/links/": "links",
+    "/courses/": "courses",
+    "/medias/files": "files",
+}
+
+# Collections a GET /<collection>/<id> can look a record up in, with the singular response key
+RECORD_ENDPOINTS = {"contacts": "contact", "opportunities": "opportunity", "invoices": "invoice",
+                    "products": "product", "conversations": "conversation"}
+
+
+# ──────────────────────────────────────────────
+# Synthetic Data
+# ──────────────────────────────────────────────
+
+FIRST_NAMES = ("Ava", "Liam", "Noah", "Emma", "Mia", "Lucas", "Zoe", "Ethan", "Chloe", "Owen", "Nora", "Leo")
+LAST_NAMES = ("Smith", "Nguyen", "Patel", "Garcia", "Brown", "Lee", "Martin", "Wilson", "Singh", "Clark")
+TAGS = ("buyer", "seller", "investor", "open-house", "zillow", "vip", "first-time", "relocation")
+EPOCH = 1767225600  # 2026-01-01T00:00:00Z
+
+
+def _ghl_id(rng):
+    """A 20-character ID shaped like GHL's."""
+    return "".join(rng.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789") for _ in range(20))
+
+
+def _iso(seconds):
+    return time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime(seconds))
+
+
+def synthetic_data(location_id, contacts=2000, opportunities=500, seed=1):
+    """Deterministic records for every collection the client reads."""
+    rng = random.Random(seed)
+    data = {"contacts": [], "opportunities": []}
+    for i in range(contacts):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        added = EPOCH + i * 60
+        data["contacts"].append({
+            "id": _ghl_id(rng), "locationId": location_id,
+            "firstName": first, "lastName": last, "contactName": f"{first} {last}".lower(),
+            "email": f"{first}.{last}{i}@example.com".lower(), "phone": f"+1416555{i % 10000:04d}",
+            "companyName": rng.choice(("", "Maple Realty", "Harbour Homes")),
+            "tags": rng.sample(TAGS, rng.randint(0, 3)), "source": rng.choice(("zillow", "website", "referral")),
+            "dateAdded": _iso(added), "dateUpdated": _iso(added + rng.randint(0, 86400 * 30)),
+            "customFields": [{"id": "cfBudget0000000000001", "value": rng.randint(3, 20) * 50000}],
+        })
+    stages = [{"id": f"stage{n}{'0' * 14}", "name": name, "position": n}
+              for n, name in enumerate(("New Lead", "Contacted", "Showing", "Offer", "Closed"))]
+    data["pipelines"] = [{"id": "pipeBuyers00000000001", "name": "Buyers", "stages": stages},
+                         {"id": "pipeSellers0000000001", "name": "Sellers", "stages": stages}]
+    for i in range(opportunities):
+        contact = data["contacts"][i % len(data["contacts"])] if data["contacts"] else {}
+        pipeline = data["pipelines"][i % 2]
+        updated = EPOCH + i * 300
+        data["opportunities"].append({
+            "id": _ghl_id(rng), "name": f"{contact.get('contactName', 'lead')} - {pipeline['name'].lower()}",
+            "pipelineId": pipeline["id"], "pipelineStageId": rng.choice(stages)["id"],
+            "status": rng.choice(("open", "open", "won", "lost")), "monetaryValue": rng.randint(2, 15) * 100000,
+            "contactId": contact.get("id"), "locationId": location_id,
+            "createdAt": _iso(updated - 86400), "updatedAt": _iso(updated),
+        })
+    data["calendars"] = [{"id": "calShowings0000000001", "name": "Showings", "locationId": location_id}]
+    data["users"] = [{"id": "userAgent000000000001", "name": "Agent One", "email": "agent@example.com"}]
+    data["customFields"] = [{"id": "cfBudget0000000000001", "name": "Budget", "fieldKey": "contact.budget", "dataType": "MONETORY"}]
+    data["tags"] = [{"id": f"tag{n:017d}", "name": name} for n, name in enumerate(TAGS)]
+    data["workflows"] = [{"id": f"wf{n:018d}", "name": name, "status": "published"}
+                         for n, name in enumerate(("New lead nurture", "Open house follow-up", "Past client check-in"))]
+    for name in ("invoices", "products", "forms", "submissions", "surveys", "campaigns", "funnels",
+                 "orders", "transactions", "subscriptions", "conversations", "links", "courses", "files"):
+        data.setdefault(name, [{"id": _ghl_id(rng), "name": f"{name[:-1]} {n}", "locationId": location_id} for n in range(25)])
+    return data
+
+
+# ──────────────────────────────────────────────
+# Server
+# ──────────────────────────────────────────────
+
+class MockState:
+    """Records, fault settings and counters shared by every handler thread."""
+
+    def __init__(self, location_id="mockloc", contacts=2000, opportunities=500, latency_ms=0.0, jitter_ms=0.0,
+                 rate_429=0.0, retry_after=1, rate_5xx=0.0, fixtures=None, seed=1, gzip_bodies=True):
+        self.location_id = location_id
+        self.data = synthetic_data(location_id, contacts, opportunities, seed)
+        self.recorded = {}
+        if fixtures:
+            with open(fixtures) as f:
+                loaded = json.load(f)
+            self.recorded = {k: v for k, v in loaded.items() if " " in k}
+            self.data.update({k: v for k, v in loaded.items() if " " not in k})
+        self.latency, self.jitter = latency_ms / 1000.0, jitter_ms / 1000.0
+        self.rate_429, self.retry_after, self.rate_5xx = rate_429, retry_after, rate_5xx
+        self.gzip = gzip_bodies
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counts = {"requests": 0, "injected_429": 0, "injected_5xx": 0, "not_modified": 0, "writes": 0}
+        self._reindex()
+
+    def _reindex(self):
+        self._positions = {}
+        self.index = {name: {r["id"]: r for r in rows if isinstance(r, dict) and "id" in r}
+                      for name, rows in self.data.items() if isinstance(rows, list)}
+
+    def position(self, key, rows):
+        """{id: offset} for `rows`; cached for a full collection until it changes size."""
+        if rows is not self.data.get(key):
+            return {r["id"]: i for i, r in enumerate(rows)}
+        with self.lock:
+            cached = self._positions.get(key)
+            if cached is None or cached[0] != len(rows):
+                cached = self._positions[key] = (len(rows), {r["id"]: i for i, r in enumerate(rows)})
+            return cached[1]
+
+    def count(self, key):
+        with self.lock:
+            self.counts[key] += 1
+
+    def fault(self):
+        """The injected fault for this request: 429, 500 or None."""
+        with self.lock:
+            self.counts["requests"] += 1
+            roll = self.rng.random()
+            if roll < self.rate_429:
+                self.counts["injected_429"] += 1
+                return 429
+            if roll < self.rate_429 + self.rate_5xx:
+                self.counts["injected_5xx"] += 1
+                return 500
+        return None
+
+    def delay(self):
+        if self.latency or self.jitter:
+            time.sleep(max(0.0, self.latency + (self.rng.uniform(-self.jitter, self.jitter) if self.jitter else 0.0)))
+
+    def new_id(self):
+        with self.lock:
+            return _ghl_id(self.rng)
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "ghl-mock/1"
+    # Buffered writes plus TCP_NODELAY: headers and body leave in one segment, no delayed-ACK stalls
+    wbufsize = 64 * 1024
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    @property
+    def state(self):
+        return self.server.state
+
+    def _send(self, status, payload=None, headers=None):
+        body = json.dumps(payload).encode() if payload is not None else b""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        if (self.state.gzip and len(body) >= GZIP_MIN_BYTES
+                and "gzip" in (self.headers.get("Accept-Encoding") or "").lower()):
+            body = gzip.compress(body, compresslevel=5)
+            self.send_header("Content-Encoding", "gzip")
+            self.send_header("Vary", "Accept-Encoding")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("X-RateLimit-Max", "100")
+        self.send_header("X-RateLimit-Interval-Milliseconds", "10000")
+        self.send_header("X-RateLimit-Remaining", "99")
+        self.send_header("X-RateLimit-Daily-Remaining", "199999")
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        try:
+            return json.loads(raw) if raw else {}
+        except ValueError:
+            return None
+
+    def _dispatch(self, method):
+        url = urllib.parse.urlsplit(self.path)
+        query = {k: v[-1] for k, v in urllib.parse.parse_qs(url.query).items()}
+        body = self._body() if method in ("POST", "PUT") else {}
+
+        if url.path == "/__mock__/stats":
+            with self.state.lock:
+                return self._send(200, dict(self.state.counts))
+        self.state.delay()
+        fault = self.state.fault()
+        if fault == 429:
+            return self._send(429, {"statusCode": 429, "message": "Too many requests"},
+                              {"Retry-After": str(self.state.retry_after), "X-RateLimit-Remaining": "0"})
+        if fault:
+            return self._send(fault, {"statusCode": fault, "message": "Injected server error"})
+        if body is None:
+            return self._send(400, {"statusCode": 400, "message": "Malformed JSON body"})
+        if not self.headers.get("Authorization", "").startswith("Bearer "):
+            return self._send(401, {"statusCode": 401, "message": "Missing bearer token"})
+
+        recorded = self.state.recorded.get(f"{method} {url.path}")
+        if recorded is not None:
+            return self._send(200, recorded)
+        if method == "GET":
+            status, payload = self._get(url.path, query)
+            etag = '"%s"' % hashlib.sha1(json.dumps(payload, sort_keys=True).encode()).hexdigest()[:16]
+            if status == 200 and self.headers.get("If-None-Match") == etag:
+                self.state.count("not_modified")
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", "0")
+                return self.end_headers()
+            return self._send(status, payload, {"ETag": etag} if status == 200 else None)
+        self.state.count("writes")
+        status, payload = self._write(method, url.path, body)
+        return self._send(status, payload)
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_PUT(self):
+        self._dispatch("PUT")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+    # ── Reads ───────────────────────────────────
+
+    def _page(self, key, rows, query):
+        """One page of `rows`, continuing after startAfterId (GHL's cursor pair)."""
+        limit = max(1, min(int(query.get("limit") or 20), PAGE_LIMIT_MAX))
+        start = 0
+        after_id = query.get("startAfterId")
+        if after_id:
+            start = self.state.position(key, rows).get(after_id, len(rows) - 1) + 1
+        page = rows[start:start + limit]
+        meta = {"total": len(rows), "currentPage": start // limit + 1}
+        if start + limit < len(rows) and page:
+            last = page[-1]
+            meta.update(startAfter=start + len(page), startAfterId=last["id"],
+                        nextPageUrl=f"{self.headers.get('Host', '')}{self.path.split('?')[0]}?startAfterId={last['id']}")
+        return {key: page, "meta": meta}
+
+    def _get(self, path, query):
+        data = self.state.data
+        if path in LIST_ENDPOINTS:
+            key = LIST_ENDPOINTS[path]
+            rows = data.get(key, [])
+            if path == "/contacts/" and query.get("query"):
+                needle = query["query"].lower()
+                rows = [c for c in rows if needle in json.dumps(c).lower()]
+            if path == "/opportunities/search" and query.get("pipelineId"):
+                rows = [o for o in rows if o.get("pipelineId") == query["pipelineId"]]
+            return 200, self._page(key, rows, query)
+        if path in META_ENDPOINTS:
+            return 200, {META_ENDPOINTS[path]: data.get(META_ENDPOINTS[path], [])}
+        parts = [p for p in path.split("/") if p]
+        if len(parts) >= 2 and parts[0] == "locations":
+            if len(parts) == 2:
+                return 200, {"location": {"id": parts[1], "name": "Mock Realty", "timezone": "America/Toronto"}}
+            if parts[2] in ("customFields", "tags", "customValues"):
+                return 200, {parts[2]: data.get(parts[2], [])}
+        if len(parts) == 3 and parts[0] == "calendars" and parts[2] == "free-slots":
+            day = time.strftime("%Y-%m-%d", time.gmtime())
+            return 200, {day: {"slots": [f"{day}T{h:02d}:00:00-05:00" for h in range(9, 17)]}}
+        if len(parts) == 2 and parts[0] in RECORD_ENDPOINTS:
+            record = self.state.index.get(parts[0], {}).get(parts[1])
+            if record is None:
+                return 404, {"statusCode": 404, "message": f"{RECORD_ENDPOINTS[parts[0]].title()} not found"}
+            return 200, {RECORD_ENDPOINTS[parts[0]]: record}
+        return 200, {"path": path, "items": []}
+
+    # ── Writes ──────────────────────────────────
+
+    def _search_contacts(self, body):
+        """POST /contacts/search: dateUpdated ascending with a searchAfter cursor."""
+        rows = sorted(self.state.data["contacts"], key=lambda c: (c.get("dateUpdated", ""), c["id"]))
+        for f in body.get("filters") or []:
+            if f.get("field") == "dateUpdated" and isinstance(f.get("value"), dict) and "gte" in f["value"]:
+                rows = [c for c in rows if c.get("dateUpdated", "") >= f["value"]["gte"]]
+        if body.get("searchAfter"):
+            after = tuple(body["searchAfter"])
+            rows = [c for c in rows if (c.get("dateUpdated", ""), c["id"]) > after]
+        limit = max(1, min(int(body.get("pageLimit") or 20), 500))
+        page = [dict(c, searchAfter=[c.get("dateUpdated", ""), c["id"]]) for c in rows[:limit]]
+        return 200, {"contacts": page, "total": len(rows)}
+
+    def _write(self, method, path, body):
+        parts = [p for p in path.split("/") if p]
+        state = self.state
+        if path == "/contacts/search" and method == "POST":
+            return self._search_contacts(body)
+        if path in ("/contacts/", "/contacts/upsert") and method == "POST":
+            with state.lock:
+                existing = None
+                if path == "/contacts/upsert":
+                    existing = next((c for c in state.data["contacts"] if body.get("email") and c.get("email") == body["email"]), None)
+                if existing:
+                    existing.update(body, dateUpdated=_iso(time.time()))
+                    return 200, {"new": False, "contact": existing}
+                contact = dict(body, id=_ghl_id(state.rng), locationId=state.location_id,
+                               dateAdded=_iso(time.time()), dateUpdated=_iso(time.time()))
+                state.data["contacts"].append(contact)
+                state.index["contacts"][contact["id"]] = contact
+            return 201, {"new": True, "contact": contact}
+        if parts[:1] == ["contacts"] and len(parts) >= 2:
+            contact = state.index.get("contacts", {}).get(parts[1])
+            if contact is None:
+                return 404, {"statusCode": 404, "message": "Contact not found"}
+            with state.lock:
+                if len(parts) == 2 and method == "PUT":
+                    contact.update(body, dateUpdated=_iso(time.time()))
+                    return 200, {"contact": contact}
+                if len(parts) == 2 and method == "DELETE":
+                    state.data["contacts"].remove(contact)
+                    del state.index["contacts"][parts[1]]
+                    return 200, {"succeded": True}
+                if parts[2] == "tags":
+                    tags = set(contact.get("tags") or [])
+                    tags = tags | set(body.get("tags", [])) if method == "POST" else tags - set(body.get("tags", []))
+                    contact["tags"] = sorted(tags)
+                    return 200 if method == "DELETE" else 201, {"tags": contact["tags"]}
+                if parts[2] == "workflow":
+                    return 200 if method == "DELETE" else 201, {"succeded": True}
+        if path == "/conversations/messages":
+            return 201, {"conversationId": state.new_id(), "messageId": state.new_id(), "msg": "Message queued"}
+        if path == "/opportunities/":
+            opportunity = dict(body, id=state.new_id(), createdAt=_iso(time.time()), updatedAt=_iso(time.time()))
+            with state.lock:
+                state.data["opportunities"].append(opportunity)
+                state.index["opportunities"][opportunity["id"]] = opportunity
+            return 201, {"opportunity": opportunity}
+        return 201 if method == "POST" else 200, {"id": state.new_id(), "path": path, "body": body}
+
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, state):
+        super().__init__(address, MockHandler)
+        self.state = state
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+def start_server(host="127.0.0.1", port=0, **options):
+    """Start a mock server on a background thread (port 0 picks a free one); returns it.
+    Call .shutdown() to stop it."""
+    server = MockServer((host, port), MockState(**options))
+    threading.Thread(target=server.serve_forever, name="ghl-mock", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the GoHighLevel API v2.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--location", default="mockloc", help="location ID the synthetic records belong to")
+    parser.add_argument("--contacts", type=int, default=2000, help="synthetic contacts to serve")
+    parser.add_argument("--opportunities", type=int, default=500, help="synthetic opportunities to serve")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="added to every response")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="random +/- spread around --latency-ms")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="fraction of requests answered with 429")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds sent with injected 429s")
+    parser.add_argument("--rate-5xx", type=float, default=0.0, help="fraction of requests answered with 500")
+    parser.add_argument("--fixtures", help="JSON file of collections and/or recorded \"METHOD /path\" responses")
+    parser.add_argument("--no-gzip", action="store_true", help="ignore Accept-Encoding and always send plain JSON")
+    parser.add_argument("--seed", type=int, default=1)
+    opts = parser.parse_args()
+
+    server = MockServer((opts.host, opts.port), MockState(
+        location_id=opts.location, contacts=opts.contacts, opportunities=opts.opportunities,
+        latency_ms=opts.latency_ms, jitter_ms=opts.jitter_ms, rate_429=opts.rate_429,
+        retry_after=opts.retry_after, rate_5xx=opts.rate_5xx, fixtures=opts.fixtures, seed=opts.seed,
+        gzip_bodies=not opts.no_gzip))
+    print(f"Mock GHL API on {server.base_url} (location {opts.location}, {opts.contacts} contacts)", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()